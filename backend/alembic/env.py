@@ -8,6 +8,7 @@ import sys
 # Add the app directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
+from app.core.config import settings
 from app.database import Base
 from app.models import *  # Import all models
 
@@ -15,6 +16,9 @@ from app.models import *  # Import all models
 # access to the values within the .ini file in use.
 config = context.config
 
+# Migrate the database the API is configured for, rather than the placeholder in alembic.ini
+config.set_main_option("sqlalchemy.url", settings.database_url.replace("%", "%%"))
+
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
@@ -62,7 +66,7 @@ def run_migrations_online() -> None:
 
     """
     connectable = engine_from_config(
-        config.get_section(config.get_section_option, "alembic"),
+        config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
     )
@@ -0,0 +1,51 @@
+"""Add the daily exchange rate history
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+The API creates missing tables itself at startup, so on a database it has
+already started against the table may exist; it is left alone then.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if sa.inspect(op.get_bind()).has_table("exchange_rates"):
+        return
+
+    op.create_table(
+        "exchange_rates",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("rate_date", sa.Date(), nullable=False),
+        sa.Column("base_currency", sa.String(length=3), nullable=False),
+        sa.Column("quote_currency", sa.String(length=3), nullable=False),
+        sa.Column("rate", sa.Float(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_exchange_rates_id"), "exchange_rates", ["id"], unique=False)
+    op.create_index(
+        "ix_exchange_rates_base_date_quote",
+        "exchange_rates",
+        ["base_currency", "rate_date", "quote_currency"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_exchange_rates_base_date_quote", table_name="exchange_rates")
+    op.drop_index(op.f("ix_exchange_rates_id"), table_name="exchange_rates")
+    op.drop_table("exchange_rates")
@@ -0,0 +1,67 @@
+"""Queue receipt OCR on the receipt rows
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:05:00
+
+Receipts no longer need an expense when they are uploaded, and carry the
+state of their OCR job. Receipts from before the queue were OCR'd when
+they were uploaded, so they start out completed.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ocr_status = sa.Enum("QUEUED", "PROCESSING", "COMPLETED", "FAILED", name="ocrstatus")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    # Created with these columns by the API at startup
+    if not inspector.has_table("receipts"):
+        return
+    if "ocr_status" in {column["name"] for column in inspector.get_columns("receipts")}:
+        return
+
+    ocr_status.create(op.get_bind(), checkfirst=True)
+    with op.batch_alter_table("receipts") as batch_op:
+        batch_op.add_column(sa.Column("ocr_status", ocr_status, server_default="COMPLETED", nullable=False))
+        batch_op.add_column(sa.Column("ocr_attempts", sa.Integer(), server_default="0", nullable=False))
+        batch_op.add_column(sa.Column("ocr_error", sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column("ocr_locked_by", sa.String(), nullable=True))
+        batch_op.add_column(sa.Column("ocr_locked_at", sa.DateTime(timezone=True), nullable=True))
+        batch_op.add_column(sa.Column("processed_at", sa.DateTime(timezone=True), nullable=True))
+        batch_op.add_column(sa.Column("uploaded_by_id", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key("receipts_uploaded_by_id_fkey", "users", ["uploaded_by_id"], ["id"])
+        batch_op.alter_column("expense_id", existing_type=sa.Integer(), nullable=True)
+        batch_op.create_index("ix_receipts_ocr_status_id", ["ocr_status", "id"], unique=False)
+
+    # The defaults only filled in existing rows; new ones get theirs from the model
+    with op.batch_alter_table("receipts") as batch_op:
+        batch_op.alter_column("ocr_status", existing_type=ocr_status, server_default=None)
+        batch_op.alter_column("ocr_attempts", existing_type=sa.Integer(), server_default=None)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("receipts") as batch_op:
+        batch_op.drop_index("ix_receipts_ocr_status_id")
+        batch_op.alter_column("expense_id", existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_constraint("receipts_uploaded_by_id_fkey", type_="foreignkey")
+        batch_op.drop_column("uploaded_by_id")
+        batch_op.drop_column("processed_at")
+        batch_op.drop_column("ocr_locked_at")
+        batch_op.drop_column("ocr_locked_by")
+        batch_op.drop_column("ocr_error")
+        batch_op.drop_column("ocr_attempts")
+        batch_op.drop_column("ocr_status")
+    ocr_status.drop(op.get_bind(), checkfirst=True)
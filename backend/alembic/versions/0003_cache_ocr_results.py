@@ -0,0 +1,61 @@
+"""Cache OCR results by image content hash
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:10:00
+
+Receipts from before this revision have no content hash; they are never
+matched against the cache.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table("receipts") and "content_hash" not in {
+        column["name"] for column in inspector.get_columns("receipts")
+    }:
+        with op.batch_alter_table("receipts") as batch_op:
+            batch_op.add_column(sa.Column("content_hash", sa.String(length=64), nullable=True))
+            batch_op.create_index("ix_receipts_content_hash", ["content_hash"], unique=False)
+
+    if not inspector.has_table("ocr_results"):
+        op.create_table(
+            "ocr_results",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("content_hash", sa.String(length=64), nullable=False),
+            sa.Column("ocr_text", sa.Text(), nullable=True),
+            sa.Column("ocr_confidence", sa.String(), nullable=True),
+            sa.Column("extracted_amount", sa.String(), nullable=True),
+            sa.Column("extracted_currency", sa.String(length=3), nullable=True),
+            sa.Column("extracted_date", sa.DateTime(), nullable=True),
+            sa.Column("extracted_merchant", sa.String(), nullable=True),
+            sa.Column("extracted_category", sa.String(), nullable=True),
+            sa.Column("hit_count", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("last_hit_at", sa.DateTime(timezone=True), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_ocr_results_id", "ocr_results", ["id"], unique=False)
+        op.create_index("ix_ocr_results_content_hash", "ocr_results", ["content_hash"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_ocr_results_content_hash", table_name="ocr_results")
+    op.drop_index("ix_ocr_results_id", table_name="ocr_results")
+    op.drop_table("ocr_results")
+    with op.batch_alter_table("receipts") as batch_op:
+        batch_op.drop_index("ix_receipts_content_hash")
+        batch_op.drop_column("content_hash")
@@ -0,0 +1,43 @@
+"""Store numeric OCR confidence scores
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 09:15:00
+
+Receipts and cached results from before this revision keep only their
+confidence label; their scores stay empty.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("receipts", "ocr_results")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    for table in TABLES:
+        if not inspector.has_table(table):
+            continue
+        if "ocr_confidence_score" in {column["name"] for column in inspector.get_columns(table)}:
+            continue
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column("ocr_confidence_score", sa.Float(), nullable=True))
+            batch_op.add_column(sa.Column("ocr_field_confidence", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("ocr_field_confidence")
+            batch_op.drop_column("ocr_confidence_score")
@@ -1,51 +1,73 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import SessionLocal, get_db
 from app.models.user import User
 from app.core.security import verify_token
+from app.core.principal import CurrentUser, user_cache
 
 security = HTTPBearer()
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get the current authenticated user."""
+def get_current_principal(credentials: HTTPAuthorizationCredentials = Depends(security)) -> CurrentUser:
+    """Get the current authenticated user's identity and role.
+
+    Comes from the token's claims, or the user cache when the token has none or the user
+    changed since it was issued, so most requests run no user query and, when the route
+    needs none either, never take a database connection.
+    """
     token = credentials.credentials
     payload = verify_token(token)
-    user_id = payload.get("sub")
-    
-    if user_id is None:
+    try:
+        user_id = int(payload.get("sub"))
+    except (TypeError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
+    principal = CurrentUser.from_claims(payload)
+    if principal is not None and not user_cache.changed_since(user_id, payload.get("iat")):
+        user_cache.claims_hits += 1
+    else:
+        with SessionLocal() as db:
+            principal = user_cache.get(db, user_id)
+    if principal is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    if not user.is_active:
+    if not principal.is_active:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Inactive user"
         )
     
+    return principal
+
+def get_current_user(
+    principal: CurrentUser = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+) -> User:
+    """Get the current authenticated user's full row, for routes that return or change it."""
+    user = db.query(User).filter(User.id == principal.id).first()
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+def get_current_active_user(current_user: CurrentUser = Depends(get_current_principal)) -> CurrentUser:
     """Get the current active user."""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-def require_admin(current_user: User = Depends(get_current_active_user)) -> User:
+def require_admin(current_user: CurrentUser = Depends(get_current_active_user)) -> CurrentUser:
     """Require admin role."""
     if current_user.role != "admin":
         raise HTTPException(
@@ -54,7 +76,7 @@ def require_admin(current_user: User = Depends(get_current_active_user)) -> User
         )
     return current_user
 
-def require_manager_or_admin(current_user: User = Depends(get_current_active_user)) -> User:
+def require_manager_or_admin(current_user: CurrentUser = Depends(get_current_active_user)) -> CurrentUser:
     """Require manager or admin role."""
     if current_user.role not in ["manager", "admin"]:
         raise HTTPException(
@@ -62,4 +84,3 @@ def require_manager_or_admin(current_user: User = Depends(get_current_active_use
             detail="Not enough permissions"
         )
     return current_user
-
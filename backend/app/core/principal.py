@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.user import User, UserRole
+
+# Users whose principal is kept in memory at most; the least recently used go first
+MAX_CACHED_USERS = 10000
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """Who is making a request: what authorization checks need, without the User row."""
+
+    id: int
+    role: UserRole
+    company_id: int
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(id=user.id, role=UserRole(user.role), company_id=user.company_id, is_active=bool(user.is_active))
+
+    @classmethod
+    def from_claims(cls, payload: Dict[str, Any]) -> Optional["CurrentUser"]:
+        """The principal signed into an access token, or None for tokens issued without claims."""
+        try:
+            return cls(
+                id=int(payload["sub"]),
+                role=UserRole(payload["role"]),
+                company_id=int(payload["company_id"]),
+                is_active=bool(payload["is_active"]),
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+
+def user_claims(user: User) -> Dict[str, Any]:
+    """Access token claims carrying everything `CurrentUser` needs."""
+    return {
+        "sub": str(user.id),
+        "role": UserRole(user.role).value,
+        "company_id": user.company_id,
+        "is_active": bool(user.is_active),
+    }
+
+class UserCache:
+    """Principals loaded from the database, kept for a short TTL.
+
+    Token claims are trusted until the user is changed through `invalidate`; tokens issued
+    before that change fall back to this cache, so updates and deletions take effect on
+    this process straight away. Other processes see them once their cached entry expires,
+    or, for claims, when the token does.
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = None, max_entries: int = MAX_CACHED_USERS):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.auth_user_cache_ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._changed_at: Dict[int, float] = {}
+        # Dependencies run in the threadpool
+        self._lock = threading.Lock()
+        self.claims_hits = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def changed_since(self, user_id: int, issued_at: Optional[float]) -> bool:
+        """Whether the user was changed after a token issued at `issued_at` was signed."""
+        with self._lock:
+            changed_at = self._changed_at.get(user_id)
+        # Tokens without an issue time can't be shown to be newer
+        return changed_at is not None and (issued_at is None or issued_at <= changed_at)
+
+    def get(self, db: Session, user_id: int) -> Optional[CurrentUser]:
+        """The user's principal, from memory when fresh, else from the database."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        user = db.query(User).filter(User.id == user_id).first()
+        if user is None:
+            return None
+        principal = CurrentUser.from_user(user)
+        with self._lock:
+            self._entries[user_id] = (principal, now + self.ttl_seconds)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return principal
+
+    def invalidate(self, user_id: int):
+        """Forget a changed user and stop trusting claims in tokens issued before now."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            # Whole seconds, like the tokens' iat; a token signed in the same second is distrusted too
+            self._changed_at[user_id] = float(int(time.time()))
+            # Older changes predate every token still valid
+            horizon = time.time() - settings.access_token_expire_minutes * 60
+            for changed_id in [uid for uid, changed_at in self._changed_at.items() if changed_at < horizon]:
+                del self._changed_at[changed_id]
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ttl_seconds": self.ttl_seconds,
+                "cached_users": len(self._entries),
+                "claims_hits": self.claims_hits,
+                "cache_hits": self.hits,
+                "cache_misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+user_cache = UserCache()
@@ -0,0 +1,48 @@
+from typing import Dict, Optional
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Room for multipart boundaries, part headers and form fields on top of the files themselves
+MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+
+class RequestSizeLimitMiddleware:
+    """Reject request bodies over a size limit while they arrive.
+
+    Starlette spools a whole multipart body to memory and temp files before a handler
+    runs, so limits checked in the handler bound neither. Bodies declaring a larger
+    Content-Length are refused before any of it is read; chunked ones are cut off once
+    they pass the limit.
+    """
+
+    def __init__(self, app: ASGIApp, max_body_size: int, path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.path_limits.get(scope["path"].rstrip("/"), self.max_body_size)
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse({"detail": "Request too large"}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI passes HTTPExceptions from body parsing through to its handlers
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Request too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
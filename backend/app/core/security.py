@@ -1,11 +1,25 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Union
+from typing import Any, Dict, Optional, Tuple, Union
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes at any other cost verify as before and are flagged for rehashing
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds,
+)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
@@ -15,22 +29,180 @@ def get_password_hash(password: str) -> str:
     """Hash a password."""
     return pwd_context.hash(password)
 
+class PasswordHasher:
+    """Bounded thread pool that keeps bcrypt off the event loop.
+
+    bcrypt releases the GIL while it works, so threads run hashes in parallel without
+    the cost of shipping them to processes.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_queue: Optional[int] = None):
+        self.workers = workers or settings.password_hash_workers or min(4, os.cpu_count() or 1)
+        self.max_queue = max_queue or settings.password_hash_max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.pending = 0
+        self.peak_pending = 0
+        self.hashed = 0
+        self.verified = 0
+        self.rehashed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, fn, *args):
+        """Run `fn(*args)` on a bcrypt thread, answering 503 once the queue is full."""
+        if self.pending >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many sign-ins in progress, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+
+        self.start()
+        self.pending += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.total_seconds += time.perf_counter() - started
+
+    async def hash(self, password: str) -> str:
+        """Hash a password at the configured cost."""
+        hashed_password = await self._run(pwd_context.hash, password)
+        self.hashed += 1
+        return hashed_password
+
+    async def verify(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Check a password, returning whether it matched and, when its hash was made at
+        another cost, a fresh hash to store in its place."""
+        valid, new_hash = await self._run(pwd_context.verify_and_update, plain_password, hashed_password)
+        self.verified += 1
+        if new_hash is not None:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.hashed + self.verified
+        return {
+            "workers": self.workers,
+            "bcrypt_rounds": settings.bcrypt_rounds,
+            "pending": self.pending,
+            "peak_pending": self.peak_pending,
+            "max_queue": self.max_queue,
+            "hashed": self.hashed,
+            "verified": self.verified,
+            "rehashed": self.rehashed,
+            "rejected": self.rejected,
+            # Includes time spent waiting for a thread
+            "avg_ms": round(self.total_seconds / calls * 1000, 1) if calls else None,
+        }
+
+password_hasher = PasswordHasher()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token."""
     to_encode = data.copy()
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
+        expire = now + timedelta(minutes=settings.access_token_expire_minutes)
     
-    to_encode.update({"exp": expire})
+    # iat tells tokens signed before a user was changed from those signed after
+    to_encode.update({"exp": expire, "iat": now})
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
+class TokenCache:
+    """Bounded LRU of tokens whose signature and claims have been checked, until they expire.
+
+    Clients send the same bearer token with every request; a hit costs one SHA-256 of the
+    token instead of an HMAC check and JSON decoding. Keys are digests, so the cache holds
+    no usable tokens, and only verified tokens are added, so invalid ones can't fill it.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries if max_entries is not None else settings.jwt_cache_max_entries
+        self._entries: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+        # verify_token runs in threadpool dependencies
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, key: bytes) -> Optional[dict]:
+        """The verified claims for a token digest, unless missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, expires_at = entry
+            if expires_at <= time.time():
+                # Decoded again so the client gets jose's expiry error
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Callers get their own copy to modify
+        return dict(payload)
+
+    def put(self, key: bytes, payload: dict):
+        expires_at = payload.get("exp")
+        # Tokens that never expire are verified every time
+        if not self.max_entries or not isinstance(expires_at, (int, float)):
+            return
+        with self._lock:
+            self._entries[key] = (dict(payload), float(expires_at))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+            }
+
+token_cache = TokenCache()
+
 def verify_token(token: str) -> dict:
     """Verify and decode a JWT token."""
+    key = None
+    if token_cache.max_entries:
+        key = TokenCache.key(token)
+        payload = token_cache.get(key)
+        if payload is not None:
+            return payload
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        if key is not None:
+            token_cache.put(key, payload)
         return payload
     except JWTError:
         raise HTTPException(
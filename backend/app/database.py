@@ -1,16 +1,187 @@
-from sqlalchemy import create_engine
+import time
+import uuid
+from typing import Any, Dict
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from app.core.config import settings
 
-engine = create_engine(settings.database_url)
+# Drivers the async engine uses in place of the sync URL's
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+class PoolStats:
+    """How long requests wait for a database connection, and how often the pool opens new ones."""
+
+    def __init__(self):
+        self.engine = None
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidated = 0
+
+    def record_wait(self, seconds: float):
+        self.checkouts += 1
+        self.wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        pool = self.engine.pool
+        result = {
+            "mode": "pgbouncer" if settings.db_pgbouncer else "pooled",
+            "checkouts": self.checkouts,
+            "avg_wait_ms": round(self.wait_seconds / self.checkouts * 1000, 2) if self.checkouts else None,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 2),
+            "timeouts": self.timeouts,
+            "connects": self.connects,
+            "invalidated": self.invalidated,
+        }
+        if isinstance(pool, QueuePool):
+            result.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+                "idle": pool.checkedin(),
+            })
+        return result
+
+pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+
+class _TimedCheckout:
+    """Times each checkout, including waiting for a free connection or opening a new one."""
+
+    pool_stats: PoolStats
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.pool_stats.timeouts += 1
+            raise
+        finally:
+            self.pool_stats.record_wait(time.perf_counter() - started)
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pool_stats = pool_stats
+
+class TimedNullPool(_TimedCheckout, NullPool):
+    pool_stats = pool_stats
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pool_stats = async_pool_stats
+
+class TimedAsyncNullPool(_TimedCheckout, NullPool):
+    pool_stats = async_pool_stats
+
+def _engine_options(url: str) -> Dict[str, Any]:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        # Development only; the pool settings below are for PostgreSQL
+        return {} if parsed.database in (None, "", ":memory:") else {"poolclass": TimedQueuePool}
+
+    if settings.db_pgbouncer:
+        # PgBouncer does the pooling; holding our own connections would pin its server connections
+        options: Dict[str, Any] = {"poolclass": TimedNullPool}
+    else:
+        options = {
+            "poolclass": TimedQueuePool,
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout_seconds,
+            "pool_recycle": settings.db_pool_recycle_seconds,
+            "pool_pre_ping": settings.db_pool_pre_ping,
+        }
+        if settings.db_statement_timeout_ms:
+            options["connect_args"] = {"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"}
+    return options
+
+def async_database_url(url: str) -> URL:
+    """The async driver's form of a sync database URL, e.g. postgresql+asyncpg:// for postgresql://."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend} databases")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend])
+
+def _prepared_statement_name() -> str:
+    return f"__asyncpg_{uuid.uuid4()}__"
+
+def _async_engine_options(url: URL) -> Dict[str, Any]:
+    if url.get_backend_name() == "sqlite":
+        return {} if url.database in (None, "", ":memory:") else {"poolclass": TimedAsyncQueuePool}
+
+    server_settings = {}
+    if settings.db_statement_timeout_ms and not settings.db_pgbouncer:
+        server_settings["statement_timeout"] = str(settings.db_statement_timeout_ms)
+    if settings.db_pgbouncer:
+        # PgBouncer hands each transaction to any server connection, where asyncpg's
+        # prepared statements from an earlier one don't exist or have another's name
+        return {
+            "poolclass": TimedAsyncNullPool,
+            "connect_args": {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": _prepared_statement_name,
+            },
+        }
+    return {
+        "poolclass": TimedAsyncQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout_seconds,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "connect_args": {"server_settings": server_settings} if server_settings else {},
+    }
+
+def _instrument(sync_engine, stats: PoolStats):
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        stats.connects += 1
+
+    @event.listens_for(sync_engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        stats.invalidated += 1
+
+    if settings.db_pgbouncer and settings.db_statement_timeout_ms:
+        # Transaction pooling drops startup options, so the timeout is set per transaction
+        @event.listens_for(sync_engine, "begin")
+        def _set_statement_timeout(conn):
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(settings.db_statement_timeout_ms)}")
+
+# Scripts, background tasks and the routers not yet ported use the sync engine
+engine = create_engine(settings.database_url, **_engine_options(settings.database_url))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+pool_stats.engine = engine
+_instrument(engine, pool_stats)
+
+_async_url = make_url(settings.async_database_url) if settings.async_database_url else async_database_url(settings.database_url)
+async_engine = create_async_engine(_async_url, **_async_engine_options(_async_url))
+# Objects stay readable after commit; reloading them would need an await
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+async_pool_stats.engine = async_engine
+_instrument(async_engine.sync_engine, async_pool_stats)
 
 Base = declarative_base()
 
 def get_db():
+    """A session for the request. Sessions take a pooled connection only at their first query."""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    """An AsyncSession for the request, whose queries wait for the database without blocking the event loop.
+
+    Relationships aren't loaded on access; load the ones a route reads with selectinload.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -4,9 +4,24 @@ from fastapi.security import HTTPBearer
 from sqlalchemy.orm import Session
 import uvicorn
 
-from app.database import get_db, engine, Base
-from app.routers import auth, users, expenses, approvals, companies, ocr, currency
+from app.database import get_db, engine, async_engine, Base, pool_stats, async_pool_stats
+from app.routers import auth, users, expenses, approvals, companies, ocr, receipts, currency
 from app.core.config import settings
+from app.services.currency_service import rate_cache, start_rate_refresher, stop_rate_refresher
+from app.services.currency_provider import get_currency_provider, close_currency_provider
+from app.services.rate_history_service import start_history_updater, stop_history_updater
+from app.services.ocr_service import ocr_pool
+from app.services.image_preprocessing import preprocess_stats
+from app.services.ocr_engine import confidence_stats
+from app.services.ocr_queue import ocr_worker
+from app.services.ocr_result_cache import ocr_result_cache
+from app.services.thumbnails import thumbnail_service
+from app.core.responses import sendfile_stats
+from app.core.request_limits import RequestSizeLimitMiddleware, MULTIPART_OVERHEAD_BYTES
+from app.services.storage import get_storage
+from app.core.principal import CurrentUser, user_cache
+from app.core.security import password_hasher, token_cache
+from app.core.dependencies import require_admin
 
 # Create database tables (only if database is available)
 try:
@@ -21,6 +36,13 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Bound upload bodies before Starlette spools them; added first so CORS headers wrap its 413s
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    max_body_size=settings.max_file_size + MULTIPART_OVERHEAD_BYTES,
+    path_limits={"/api/ocr/batch": settings.max_file_size * settings.ocr_batch_max_files + MULTIPART_OVERHEAD_BYTES},
+)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -30,6 +52,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup():
+    await get_currency_provider().start()
+    start_rate_refresher()
+    start_history_updater()
+    ocr_pool.start()
+    password_hasher.start()
+    if settings.ocr_worker_enabled:
+        ocr_worker.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await stop_rate_refresher()
+    await stop_history_updater()
+    await ocr_worker.stop()
+    await ocr_pool.shutdown()
+    password_hasher.shutdown()
+    await async_engine.dispose()
+    await close_currency_provider()
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
@@ -37,6 +79,7 @@ app.include_router(companies.router, prefix="/api/companies", tags=["Companies"]
 app.include_router(expenses.router, prefix="/api/expenses", tags=["Expenses"])
 app.include_router(approvals.router, prefix="/api/approvals", tags=["Approvals"])
 app.include_router(ocr.router, prefix="/api/ocr", tags=["OCR"])
+app.include_router(receipts.router, prefix="/api/receipts", tags=["Receipts"])
 app.include_router(currency.router, prefix="/api/currency", tags=["Currency"])
 
 @app.get("/")
@@ -47,5 +90,25 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics(current_user: CurrentUser = Depends(require_admin)):
+    return {
+        "currency_rate_cache": rate_cache.stats(),
+        "currency_provider": get_currency_provider().stats(),
+        "ocr_pool": ocr_pool.stats(),
+        "ocr_worker": ocr_worker.stats(),
+        "ocr_dedup": ocr_result_cache.stats(),
+        "ocr_preprocess": preprocess_stats.stats(),
+        "ocr_confidence": confidence_stats.stats(),
+        "receipt_thumbnails": thumbnail_service.stats(),
+        "file_responses": sendfile_stats.stats(),
+        "receipt_storage": get_storage().stats(),
+        "auth_user_cache": user_cache.stats(),
+        "password_hashing": password_hasher.stats(),
+        "jwt_cache": token_cache.stats(),
+        "db_pool": pool_stats.stats(),
+        "db_pool_async": async_pool_stats.stats(),
+    }
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -2,8 +2,9 @@ from .user import User
 from .company import Company
 from .expense import Expense, ExpenseCategory
 from .approval import Approval, ApprovalRule, ApprovalWorkflow
-from .receipt import Receipt
+from .receipt import Receipt, OCRResult
 from .audit_log import AuditLog
+from .exchange_rate import ExchangeRate
 
 __all__ = [
     "User",
@@ -14,5 +15,7 @@ __all__ = [
     "ApprovalRule",
     "ApprovalWorkflow",
     "Receipt",
-    "AuditLog"
+    "OCRResult",
+    "AuditLog",
+    "ExchangeRate"
 ]
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+class ExchangeRate(Base):
+    __tablename__ = "exchange_rates"
+    __table_args__ = (
+        # Serves "latest rate on or before a date" lookups for a base currency
+        Index("ix_exchange_rates_base_date_quote", "base_currency", "rate_date", "quote_currency", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    rate_date = Column(Date, nullable=False)
+    base_currency = Column(String(3), nullable=False)
+    quote_currency = Column(String(3), nullable=False)
+    rate = Column(Float, nullable=False)  # Units of quote currency per unit of base currency
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<ExchangeRate(date={self.rate_date}, {self.base_currency}->{self.quote_currency}={self.rate})>"
@@ -1,10 +1,21 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+import enum
 from app.database import Base
 
+class OCRStatus(str, enum.Enum):
+    QUEUED = "queued"
+    PROCESSING = "processing"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
 class Receipt(Base):
     __tablename__ = "receipts"
+    __table_args__ = (
+        # Workers claim the oldest queued job
+        Index("ix_receipts_ocr_status_id", "ocr_status", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, nullable=False)
@@ -12,9 +23,12 @@ class Receipt(Base):
     file_path = Column(String, nullable=False)
     file_size = Column(Integer, nullable=False)
     mime_type = Column(String, nullable=False)
+    content_hash = Column(String(64), index=True)  # SHA-256 of the uploaded bytes
     is_processed = Column(Boolean, default=False)
     ocr_text = Column(Text)
-    ocr_confidence = Column(String)  # Store as string to preserve decimal precision
+    ocr_confidence = Column(String)  # "high", "medium" or "low"
+    ocr_confidence_score = Column(Float)  # Mean Tesseract word confidence of the key fields, 0-100
+    ocr_field_confidence = Column(Text)  # JSON object of per-field confidences
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # OCR extracted data
@@ -24,12 +38,44 @@ class Receipt(Base):
     extracted_merchant = Column(String)
     extracted_category = Column(String)
     
+    # OCR job queue
+    ocr_status = Column(Enum(OCRStatus), default=OCRStatus.QUEUED, nullable=False)
+    ocr_attempts = Column(Integer, default=0, nullable=False)
+    ocr_error = Column(Text)
+    ocr_locked_by = Column(String)  # Worker holding the job
+    ocr_locked_at = Column(DateTime(timezone=True))
+    processed_at = Column(DateTime(timezone=True))
+    
     # Foreign keys
-    expense_id = Column(Integer, ForeignKey("expenses.id"), nullable=False)
+    expense_id = Column(Integer, ForeignKey("expenses.id"), nullable=True)  # Set once the expense exists
+    uploaded_by_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     
     # Relationships
     expense = relationship("Expense", back_populates="receipts")
+    uploaded_by = relationship("User")
     
     def __repr__(self):
         return f"<Receipt(id={self.id}, filename='{self.filename}', processed={self.is_processed})>"
 
+class OCRResult(Base):
+    """OCR output keyed by the content hash of the image it came from."""
+    __tablename__ = "ocr_results"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), unique=True, index=True, nullable=False)
+    ocr_text = Column(Text)
+    ocr_confidence = Column(String)
+    ocr_confidence_score = Column(Float)
+    ocr_field_confidence = Column(Text)
+    extracted_amount = Column(String)
+    extracted_currency = Column(String(3))
+    extracted_date = Column(DateTime)
+    extracted_merchant = Column(String)
+    extracted_category = Column(String)
+    hit_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_hit_at = Column(DateTime(timezone=True))
+    
+    def __repr__(self):
+        return f"<OCRResult(id={self.id}, content_hash='{self.content_hash[:12]}', hits={self.hit_count})>"
+
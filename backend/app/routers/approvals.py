@@ -1,37 +1,41 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List
 from datetime import datetime
-from app.database import get_db
-from app.models.user import User
-from app.models.approval import Approval, ApprovalRule, ApprovalStatus
+from app.database import get_async_db
+from app.models.approval import Approval, ApprovalRule, ApprovalRuleApprover, ApprovalStatus
 from app.schemas.approval import ApprovalCreate, ApprovalUpdate, ApprovalResponse, ApprovalRuleCreate, ApprovalRuleResponse, ApprovalRuleWithApprovers
 from app.core.dependencies import get_current_active_user, require_manager_or_admin, require_admin
+from app.core.principal import CurrentUser
 from app.services.approval_service import ApprovalService
 
 router = APIRouter()
 
 @router.get("/pending", response_model=List[ApprovalResponse])
 async def get_pending_approvals(
-    current_user: User = Depends(require_manager_or_admin),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(require_manager_or_admin),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get pending approvals for current user."""
-    approvals = db.query(Approval).filter(
-        Approval.approver_id == current_user.id,
-        Approval.status == ApprovalStatus.PENDING
-    ).all()
+    approvals = (await db.execute(
+        select(Approval).filter(
+            Approval.approver_id == current_user.id,
+            Approval.status == ApprovalStatus.PENDING
+        )
+    )).scalars().all()
     return approvals
 
 @router.post("/{approval_id}/approve", response_model=ApprovalResponse)
 async def approve_expense(
     approval_id: int,
     comments: str = None,
-    current_user: User = Depends(require_manager_or_admin),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(require_manager_or_admin),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Approve an expense."""
-    approval = db.query(Approval).filter(Approval.id == approval_id).first()
+    approval = await db.get(Approval, approval_id)
     if not approval:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -60,8 +64,8 @@ async def approve_expense(
     approval_service = ApprovalService()
     await approval_service.process_approval(approval, db)
     
-    db.commit()
-    db.refresh(approval)
+    await db.commit()
+    await db.refresh(approval)
     
     return approval
 
@@ -69,11 +73,11 @@ async def approve_expense(
 async def reject_expense(
     approval_id: int,
     comments: str,
-    current_user: User = Depends(require_manager_or_admin),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(require_manager_or_admin),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Reject an expense."""
-    approval = db.query(Approval).filter(Approval.id == approval_id).first()
+    approval = await db.get(Approval, approval_id)
     if not approval:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -102,27 +106,29 @@ async def reject_expense(
     approval_service = ApprovalService()
     await approval_service.process_rejection(approval, db)
     
-    db.commit()
-    db.refresh(approval)
+    await db.commit()
+    await db.refresh(approval)
     
     return approval
 
 @router.get("/rules/", response_model=List[ApprovalRuleWithApprovers])
 async def get_approval_rules(
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get approval rules for company."""
-    rules = db.query(ApprovalRule).filter(
-        ApprovalRule.company_id == current_user.company_id
-    ).all()
+    rules = (await db.execute(
+        select(ApprovalRule).options(selectinload(ApprovalRule.approvers)).filter(
+            ApprovalRule.company_id == current_user.company_id
+        )
+    )).scalars().all()
     return rules
 
 @router.post("/rules/", response_model=ApprovalRuleResponse)
 async def create_approval_rule(
     rule_data: ApprovalRuleCreate,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create approval rule."""
     db_rule = ApprovalRule(
@@ -137,12 +143,11 @@ async def create_approval_rule(
     )
     
     db.add(db_rule)
-    db.commit()
-    db.refresh(db_rule)
+    await db.commit()
+    await db.refresh(db_rule)
     
     # Add approvers
     for i, approver_id in enumerate(rule_data.approver_ids):
-        from app.models.approval import ApprovalRuleApprover
         approver = ApprovalRuleApprover(
             rule_id=db_rule.id,
             approver_id=approver_id,
@@ -150,7 +155,7 @@ async def create_approval_rule(
         )
         db.add(approver)
     
-    db.commit()
+    await db.commit()
     
     return db_rule
 
@@ -158,11 +163,11 @@ async def create_approval_rule(
 async def update_approval_rule(
     rule_id: int,
     rule_data: ApprovalRuleCreate,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update approval rule."""
-    rule = db.query(ApprovalRule).filter(ApprovalRule.id == rule_id).first()
+    rule = await db.get(ApprovalRule, rule_id)
     if not rule:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -185,13 +190,12 @@ async def update_approval_rule(
     # Update approvers if provided
     if "approver_ids" in update_data:
         # Remove existing approvers
-        db.query(ApprovalRuleApprover).filter(
-            ApprovalRuleApprover.rule_id == rule_id
-        ).delete()
+        await db.execute(
+            delete(ApprovalRuleApprover).filter(ApprovalRuleApprover.rule_id == rule_id)
+        )
         
         # Add new approvers
         for i, approver_id in enumerate(rule_data.approver_ids):
-            from app.models.approval import ApprovalRuleApprover
             approver = ApprovalRuleApprover(
                 rule_id=rule.id,
                 approver_id=approver_id,
@@ -199,7 +203,7 @@ async def update_approval_rule(
             )
             db.add(approver)
     
-    db.commit()
-    db.refresh(rule)
+    await db.commit()
+    await db.refresh(rule)
     
     return rule
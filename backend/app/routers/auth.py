@@ -4,8 +4,9 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models.user import User
 from app.schemas.user import UserCreate, UserResponse, UserLogin
-from app.core.security import verify_password, get_password_hash, create_access_token
+from app.core.security import create_access_token, password_hasher
 from app.core.dependencies import get_current_user
+from app.core.principal import user_claims
 from datetime import timedelta
 from app.core.config import settings
 
@@ -42,7 +43,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         company_id = default_company.id
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     db_user = User(
         email=user_data.email,
         hashed_password=hashed_password,
@@ -63,7 +64,8 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     """Login user and return access token."""
     user = db.query(User).filter(User.email == form_data.username).first()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    valid, new_hash = await password_hasher.verify(form_data.password, user.hashed_password) if user else (False, None)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -76,9 +78,14 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
             detail="Inactive user"
         )
     
+    # Stored at an old bcrypt cost; upgrade it now we have the password
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
+    
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
-        data={"sub": str(user.id)}, expires_delta=access_token_expires
+        data=user_claims(user), expires_delta=access_token_expires
     )
     
     return {
@@ -130,7 +137,7 @@ async def reset_password(
         )
     
     # Update password
-    user.hashed_password = get_password_hash(new_password)
+    user.hashed_password = await password_hasher.hash(new_password)
     db.commit()
     
     return {"message": "Password updated successfully"}
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models.user import User
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
+import numpy as np
 from app.core.dependencies import get_current_active_user
+from app.core.principal import CurrentUser
+from app.schemas.currency import BatchConversionRequest, BatchConversionResponse
 from app.services.currency_service import CurrencyService
 from typing import Dict, Any
 
@@ -10,8 +11,7 @@ router = APIRouter()
 
 @router.get("/rates")
 async def get_exchange_rates(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
     """Get current exchange rates."""
     currency_service = CurrencyService()
@@ -23,8 +23,7 @@ async def convert_currency(
     amount: float,
     from_currency: str,
     to_currency: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
     """Convert currency amount."""
     currency_service = CurrencyService()
@@ -36,6 +35,42 @@ async def convert_currency(
         "converted_amount": converted_amount
     }
 
+@router.post("/convert/batch", response_model=BatchConversionResponse)
+async def convert_currency_batch(
+    request: BatchConversionRequest,
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    """Convert many (amount, from_currency, to_currency) triples in one pass."""
+    currency_service = CurrencyService()
+    try:
+        matrix = await currency_service.get_rate_matrix()
+    except Exception as e:
+        # Only with nothing cached; a whole batch at the 1.0 fallback would be silently wrong
+        print(f"Currency API error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Exchange rates are unavailable"
+        )
+
+    unknown_currencies = set()
+    if request.items:
+        amounts, from_currencies, to_currencies = zip(*request.items)
+        converted, rates = matrix.convert_batch(amounts, from_currencies, to_currencies)
+        for i in np.flatnonzero(np.isnan(rates)):
+            unknown_currencies.update(
+                code for code in (from_currencies[i], to_currencies[i]) if code not in matrix.index
+            )
+    else:
+        converted = rates = np.empty(0)
+
+    # Build the JSON directly; response_model validation is too slow for tens of thousands of rows
+    return JSONResponse({
+        "count": len(request.items),
+        "converted_amounts": [None if value != value else value for value in converted.tolist()],
+        "rates": [None if value != value else value for value in rates.tolist()],
+        "unknown_currencies": sorted(unknown_currencies)
+    })
+
 @router.get("/currencies")
 async def get_supported_currencies():
     """Get list of supported currencies."""
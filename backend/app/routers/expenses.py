@@ -1,34 +1,55 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
-from app.database import get_db
-from app.models.user import User
+from app.database import get_async_db
 from app.models.expense import Expense, ExpenseCategory, ExpenseStatus
 from app.models.company import Company
 from app.schemas.expense import ExpenseCreate, ExpenseUpdate, ExpenseResponse, ExpenseWithDetails, ExpenseCategoryCreate, ExpenseCategoryResponse
 from app.core.dependencies import get_current_active_user, require_manager_or_admin
+from app.core.principal import CurrentUser
 from app.services.currency_service import CurrencyService
+from app.services.rate_history_service import RateHistoryService
 from app.services.approval_service import ApprovalService
 
 router = APIRouter()
 
+# Relationships ExpenseWithDetails reads; an AsyncSession can't load them on access
+EXPENSE_DETAILS = (
+    selectinload(Expense.submitter),
+    selectinload(Expense.company),
+    selectinload(Expense.category),
+    selectinload(Expense.approvals),
+    selectinload(Expense.receipts),
+)
+
+async def get_expense_or_404(db: AsyncSession, expense_id: int, *options) -> Expense:
+    expense = (await db.execute(select(Expense).options(*options).filter(Expense.id == expense_id))).scalars().first()
+    if not expense:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Expense not found"
+        )
+    return expense
+
 @router.get("/", response_model=List[ExpenseResponse])
 async def get_expenses(
     skip: int = 0,
     limit: int = 100,
     status_filter: Optional[ExpenseStatus] = None,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get expenses for current user."""
-    query = db.query(Expense).filter(Expense.submitter_id == current_user.id)
+    query = select(Expense).filter(Expense.submitter_id == current_user.id)
     
     if status_filter:
         query = query.filter(Expense.status == status_filter)
     
-    expenses = query.offset(skip).limit(limit).all()
+    expenses = (await db.execute(query.offset(skip).limit(limit))).scalars().all()
     return expenses
 
 @router.get("/company", response_model=List[ExpenseWithDetails])
@@ -36,49 +57,44 @@ async def get_company_expenses(
     skip: int = 0,
     limit: int = 100,
     status_filter: Optional[ExpenseStatus] = None,
-    current_user: User = Depends(require_manager_or_admin),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(require_manager_or_admin),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all expenses in company (managers and admins only)."""
-    query = db.query(Expense).filter(Expense.company_id == current_user.company_id)
+    query = select(Expense).options(*EXPENSE_DETAILS).filter(Expense.company_id == current_user.company_id)
     
     if status_filter:
         query = query.filter(Expense.status == status_filter)
     
-    expenses = query.offset(skip).limit(limit).all()
+    expenses = (await db.execute(query.offset(skip).limit(limit))).scalars().all()
     return expenses
 
 @router.get("/pending-approvals", response_model=List[ExpenseWithDetails])
 async def get_pending_approvals(
-    current_user: User = Depends(require_manager_or_admin),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(require_manager_or_admin),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get expenses pending approval for managers."""
     # Get expenses that need approval from this user
     from app.models.approval import Approval, ApprovalStatus
-    pending_approvals = db.query(Approval).filter(
+    expense_ids = select(Approval.expense_id).filter(
         Approval.approver_id == current_user.id,
         Approval.status == ApprovalStatus.PENDING
-    ).all()
-    
-    expense_ids = [approval.expense_id for approval in pending_approvals]
-    expenses = db.query(Expense).filter(Expense.id.in_(expense_ids)).all()
+    )
+    expenses = (await db.execute(
+        select(Expense).options(*EXPENSE_DETAILS).filter(Expense.id.in_(expense_ids))
+    )).scalars().all()
     
     return expenses
 
 @router.get("/{expense_id}", response_model=ExpenseWithDetails)
 async def get_expense(
     expense_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get expense by ID."""
-    expense = db.query(Expense).filter(Expense.id == expense_id).first()
-    if not expense:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Expense not found"
-        )
+    expense = await get_expense_or_404(db, expense_id, *EXPENSE_DETAILS)
     
     # Check permissions
     if (current_user.role == "employee" and expense.submitter_id != current_user.id) or \
@@ -93,18 +109,28 @@ async def get_expense(
 @router.post("/", response_model=ExpenseResponse)
 async def create_expense(
     expense_data: ExpenseCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new expense."""
-    # Convert currency to company default currency
-    currency_service = CurrencyService()
-    company = db.query(Company).filter(Company.id == current_user.company_id).first()
-    
-    exchange_rate = await currency_service.get_exchange_rate(
-        expense_data.currency, 
+    # Convert currency to company default currency at the rate on the expense date
+    company = await db.get(Company, current_user.company_id)
+    
+    rate_history = RateHistoryService()
+    # Shared with the background updater, which uses a sync Session
+    exchange_rate = await db.run_sync(
+        rate_history.get_rate,
+        expense_data.expense_date.date(),
+        expense_data.currency,
         company.default_currency.value
     )
+    if exchange_rate is None:
+        # History not stored for this date yet; fall back to the live rate
+        currency_service = CurrencyService()
+        exchange_rate = await currency_service.get_exchange_rate(
+            expense_data.currency, 
+            company.default_currency.value
+        )
     
     amount_in_default_currency = expense_data.amount * Decimal(str(exchange_rate))
     
@@ -122,8 +148,8 @@ async def create_expense(
     )
     
     db.add(db_expense)
-    db.commit()
-    db.refresh(db_expense)
+    await db.commit()
+    await db.refresh(db_expense)
     
     return db_expense
 
@@ -131,16 +157,11 @@ async def create_expense(
 async def update_expense(
     expense_id: int,
     expense_data: ExpenseUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update expense."""
-    expense = db.query(Expense).filter(Expense.id == expense_id).first()
-    if not expense:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Expense not found"
-        )
+    expense = await get_expense_or_404(db, expense_id)
     
     # Check permissions
     if expense.submitter_id != current_user.id:
@@ -161,24 +182,19 @@ async def update_expense(
     for field, value in update_data.items():
         setattr(expense, field, value)
     
-    db.commit()
-    db.refresh(expense)
+    await db.commit()
+    await db.refresh(expense)
     
     return expense
 
 @router.post("/{expense_id}/submit")
 async def submit_expense(
     expense_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Submit expense for approval."""
-    expense = db.query(Expense).filter(Expense.id == expense_id).first()
-    if not expense:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Expense not found"
-        )
+    expense = await get_expense_or_404(db, expense_id)
     
     # Check permissions
     if expense.submitter_id != current_user.id:
@@ -201,27 +217,29 @@ async def submit_expense(
     approval_service = ApprovalService()
     await approval_service.start_approval_workflow(expense, db)
     
-    db.commit()
+    await db.commit()
     
     return {"message": "Expense submitted for approval"}
 
 @router.get("/categories/", response_model=List[ExpenseCategoryResponse])
 async def get_expense_categories(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get expense categories for company."""
-    categories = db.query(ExpenseCategory).filter(
-        ExpenseCategory.company_id == current_user.company_id,
-        ExpenseCategory.is_active == True
-    ).all()
+    categories = (await db.execute(
+        select(ExpenseCategory).filter(
+            ExpenseCategory.company_id == current_user.company_id,
+            ExpenseCategory.is_active == True
+        )
+    )).scalars().all()
     return categories
 
 @router.post("/categories/", response_model=ExpenseCategoryResponse)
 async def create_expense_category(
     category_data: ExpenseCategoryCreate,
-    current_user: User = Depends(require_manager_or_admin),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(require_manager_or_admin),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create expense category."""
     db_category = ExpenseCategory(
@@ -231,7 +249,7 @@ async def create_expense_category(
     )
     
     db.add(db_category)
-    db.commit()
-    db.refresh(db_category)
+    await db.commit()
+    await db.refresh(db_category)
     
     return db_category
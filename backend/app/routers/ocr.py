@@ -1,19 +1,52 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models.user import User
+from app.database import get_db, SessionLocal
+from app.models.receipt import Receipt, OCRStatus
 from app.core.dependencies import get_current_active_user
-from app.services.ocr_service import OCRService
-from app.schemas.receipt import ReceiptResponse, ReceiptWithOCR
-import os
+from app.core.principal import CurrentUser
+from app.services.ocr_service import OCRService, OCRPoolSaturated
+from app.services.ocr_result_cache import receipt_extracted_data, apply_extracted_data, ocr_result_cache
+from app.services.upload_service import save_upload, UploadTooLarge, StoredUpload
+from app.services.thumbnails import thumbnail_service
+from app.routers.receipts import get_company_receipt
+from app.schemas.receipt import ReceiptResponse, OCRExtractResponse, OCRJobStatus
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
 from app.core.config import settings
 
 router = APIRouter()
 
-@router.post("/extract", response_model=ReceiptWithOCR)
+async def _save_upload(file: UploadFile) -> StoredUpload:
+    """Stream an upload to disk, rejecting it as soon as it passes the size limit."""
+    try:
+        return await save_upload(file)
+    except UploadTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File too large"
+        )
+
+async def _run_ocr(file_path: str) -> dict:
+    """Run OCR on a saved upload, shedding load when the worker pool is saturated."""
+    ocr_service = OCRService()
+    try:
+        return await ocr_service.extract_receipt_data(file_path)
+    except OCRPoolSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="OCR is busy, please retry shortly",
+            headers={"Retry-After": "5"}
+        )
+
+@router.post("/extract", response_model=OCRExtractResponse)
 async def extract_receipt_data(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_active_user),
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Extract data from receipt using OCR."""
@@ -25,40 +58,37 @@ async def extract_receipt_data(
         )
     
     # Validate file size
-    if file.size > settings.max_file_size:
+    if file.size is not None and file.size > settings.max_file_size:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="File too large"
         )
     
-    # Save file
-    os.makedirs(settings.upload_directory, exist_ok=True)
-    file_path = os.path.join(settings.upload_directory, file.filename)
-    
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    # Save file, hashing it on the way in
+    upload = await _save_upload(file)
     
-    # Process with OCR
-    ocr_service = OCRService()
-    extracted_data = await ocr_service.extract_receipt_data(file_path)
+    # Reuse results for an identical image, otherwise process with OCR
+    extracted_data = ocr_result_cache.lookup(db, upload.content_hash)
+    if extracted_data is None:
+        extracted_data = await _run_ocr(upload.path)
+        ocr_result_cache.store(db, upload.content_hash, extracted_data)
     
     return {
         "filename": file.filename,
-        "file_path": file_path,
-        "file_size": file.size,
+        "file_path": upload.path,
+        "file_size": upload.size,
         "mime_type": file.content_type,
         "ocr_extracted_data": extracted_data
     }
 
-@router.post("/process-receipt")
+@router.post("/process-receipt", status_code=status.HTTP_202_ACCEPTED)
 async def process_receipt(
     file: UploadFile = File(...),
     expense_id: int = None,
-    current_user: User = Depends(get_current_active_user),
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Process receipt and create expense entry."""
+    """Store a receipt and queue it for OCR; poll /jobs/{receipt_id} for the result."""
     # Validate file
     if file.content_type not in settings.allowed_file_types:
         raise HTTPException(
@@ -66,50 +96,244 @@ async def process_receipt(
             detail="File type not supported"
         )
     
-    if file.size > settings.max_file_size:
+    if file.size is not None and file.size > settings.max_file_size:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="File too large"
         )
     
-    # Save file
-    os.makedirs(settings.upload_directory, exist_ok=True)
-    file_path = os.path.join(settings.upload_directory, file.filename)
-    
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    # Save file, hashing it on the way in
+    upload = await _save_upload(file)
     
-    # Process with OCR
-    ocr_service = OCRService()
-    extracted_data = await ocr_service.extract_receipt_data(file_path)
-    
-    # Create receipt record
-    from app.models.receipt import Receipt
+    # Create receipt record; an OCR worker picks it up from the queue
     receipt = Receipt(
         filename=file.filename,
         original_filename=file.filename,
-        file_path=file_path,
-        file_size=file.size,
+        file_path=upload.path,
+        file_size=upload.size,
         mime_type=file.content_type,
-        is_processed=True,
-        ocr_text=extracted_data.get("text", ""),
-        ocr_confidence=extracted_data.get("confidence", ""),
-        extracted_amount=extracted_data.get("amount", ""),
-        extracted_currency=extracted_data.get("currency", ""),
-        extracted_date=extracted_data.get("date"),
-        extracted_merchant=extracted_data.get("merchant", ""),
-        extracted_category=extracted_data.get("category", ""),
-        expense_id=expense_id
+        content_hash=upload.content_hash,
+        is_processed=False,
+        ocr_status=OCRStatus.QUEUED,
+        expense_id=expense_id,
+        uploaded_by_id=current_user.id
     )
     
+    # The same image was processed before; no OCR needed
+    cached_data = ocr_result_cache.lookup(db, upload.content_hash)
+    if cached_data is not None:
+        apply_extracted_data(receipt, cached_data)
+        receipt.is_processed = True
+        receipt.ocr_status = OCRStatus.COMPLETED
+        receipt.processed_at = datetime.now(timezone.utc)
+    
     db.add(receipt)
     db.commit()
     db.refresh(receipt)
     
     return {
         "receipt_id": receipt.id,
-        "extracted_data": extracted_data,
-        "message": "Receipt processed successfully"
+        "status": receipt.ocr_status,
+        "status_url": f"/api/ocr/jobs/{receipt.id}",
+        "message": "Receipt processed from cache" if receipt.is_processed else "Receipt queued for processing"
     }
 
+@router.post("/batch")
+async def process_receipt_batch(
+    files: List[UploadFile] = File(...),
+    expense_id: Optional[int] = None,
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """OCR several receipts in parallel, streaming one NDJSON line per receipt as it finishes.
+
+    Receipts are saved in a single transaction once all have finished; the last line
+    lists their IDs in upload order.
+    """
+    if len(files) > settings.ocr_batch_max_files:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.ocr_batch_max_files} files per batch"
+        )
+    
+    for file in files:
+        if file.content_type not in settings.allowed_file_types:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"File type not supported: {file.filename}"
+            )
+        if file.size is not None and file.size > settings.max_file_size:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"File too large: {file.filename}"
+            )
+    
+    # Save everything before streaming starts; the request body is gone afterwards
+    uploads = [await _save_upload(file) for file in files]
+    receipts = [
+        Receipt(
+            filename=file.filename,
+            original_filename=file.filename,
+            file_path=upload.path,
+            file_size=upload.size,
+            mime_type=file.content_type,
+            content_hash=upload.content_hash,
+            is_processed=False,
+            ocr_status=OCRStatus.PROCESSING,
+            expense_id=expense_id,
+            uploaded_by_id=current_user.id
+        )
+        for file, upload in zip(files, uploads)
+    ]
+    
+    cached = {}
+    for content_hash in {upload.content_hash for upload in uploads}:
+        cached_data = ocr_result_cache.lookup(db, content_hash)
+        if cached_data is not None:
+            cached[content_hash] = cached_data
+    
+    return StreamingResponse(
+        _stream_batch_results(receipts, cached),
+        media_type="application/x-ndjson"
+    )
+
+async def _stream_batch_results(receipts: List[Receipt], cached: dict):
+    """Yield NDJSON result lines as OCR finishes, then save every receipt at once."""
+    ocr_service = OCRService()
+    # Leave room in the pool queue for single uploads running alongside the batch
+    slots = asyncio.Semaphore(ocr_service.pool.workers)
+    
+    async def run(content_hash: str, file_path: str):
+        async with slots:
+            try:
+                extracted_data = await ocr_service.extract_receipt_data(file_path, raise_errors=True)
+            except Exception as e:
+                return content_hash, None, e
+            await thumbnail_service.ensure_quietly(file_path, content_hash)
+            return content_hash, extracted_data, None
+    
+    # Identical images in one batch are processed once
+    by_hash = {}
+    for index, receipt in enumerate(receipts):
+        by_hash.setdefault(receipt.content_hash, []).append(index)
+    
+    def finish(indexes: List[int], extracted_data: Optional[dict], error: Optional[Exception]):
+        for index in indexes:
+            receipt = receipts[index]
+            if extracted_data is not None:
+                apply_extracted_data(receipt, extracted_data)
+                receipt.is_processed = True
+                receipt.ocr_status = OCRStatus.COMPLETED
+                receipt.processed_at = datetime.now(timezone.utc)
+            elif isinstance(error, OCRPoolSaturated):
+                # Hand over to the background OCR workers
+                receipt.ocr_status = OCRStatus.QUEUED
+            else:
+                receipt.ocr_status = OCRStatus.FAILED
+                receipt.ocr_error = str(error)
+                receipt.processed_at = datetime.now(timezone.utc)
+            yield json.dumps(jsonable_encoder({
+                "index": index,
+                "filename": receipt.original_filename,
+                "status": receipt.ocr_status,
+                "error": receipt.ocr_error,
+                "extracted_data": extracted_data
+            })) + "\n"
+    
+    tasks = [
+        asyncio.create_task(run(content_hash, receipts[indexes[0]].file_path))
+        for content_hash, indexes in by_hash.items()
+        if content_hash not in cached
+    ]
+    
+    ocr_results = {}
+    finished = False
+    try:
+        # Sent inside the try, so a client leaving now still has its receipts saved
+        for content_hash, indexes in by_hash.items():
+            if content_hash in cached:
+                for line in finish(indexes, cached[content_hash], None):
+                    yield line
+        
+        for next_done in asyncio.as_completed(tasks):
+            content_hash, extracted_data, error = await next_done
+            if extracted_data is not None:
+                ocr_results[content_hash] = extracted_data
+            for line in finish(by_hash[content_hash], extracted_data, error):
+                yield line
+        
+        finished = True
+        try:
+            receipt_ids = await asyncio.shield(asyncio.to_thread(_save_batch, receipts, ocr_results))
+        except Exception as e:
+            print(f"Batch OCR save error: {e}")
+            yield json.dumps({"done": True, "error": "Receipts could not be saved", "receipt_ids": []}) + "\n"
+        else:
+            yield json.dumps({"done": True, "receipt_ids": receipt_ids}) + "\n"
+    finally:
+        if not finished:
+            # The client went away mid-batch: stop OCR here and leave the rest to the queue
+            for task in tasks:
+                task.cancel()
+            for receipt in receipts:
+                if receipt.ocr_status == OCRStatus.PROCESSING:
+                    receipt.ocr_status = OCRStatus.QUEUED
+            await asyncio.shield(asyncio.to_thread(_save_batch_quietly, receipts, ocr_results))
+
+def _save_batch(receipts: List[Receipt], ocr_results: dict) -> List[int]:
+    """Insert a batch's receipts in one transaction and cache its new OCR results."""
+    db = SessionLocal()
+    try:
+        db.add_all(receipts)
+        db.commit()
+        receipt_ids = [receipt.id for receipt in receipts]
+        for content_hash, extracted_data in ocr_results.items():
+            try:
+                ocr_result_cache.store(db, content_hash, extracted_data)
+            except Exception as e:
+                # The receipts are saved; a missing cache entry only costs a later OCR run
+                db.rollback()
+                print(f"OCR result cache error: {e}")
+        return receipt_ids
+    finally:
+        db.close()
+
+def _save_batch_quietly(receipts: List[Receipt], ocr_results: dict):
+    """Save a batch nobody is waiting on, logging rather than raising a failure."""
+    try:
+        _save_batch(receipts, ocr_results)
+    except Exception as e:
+        print(f"Batch OCR save error: {e}")
+
+def _job_status(receipt_id: int, current_user: CurrentUser) -> dict:
+    """A receipt's OCR job state, read in a short session of its own; called from a worker thread."""
+    db = SessionLocal()
+    try:
+        receipt = get_company_receipt(db, receipt_id, current_user)
+        return {
+            "receipt_id": receipt.id,
+            "status": receipt.ocr_status,
+            "is_processed": receipt.is_processed,
+            "attempts": receipt.ocr_attempts,
+            "error": receipt.ocr_error,
+            "extracted_data": receipt_extracted_data(receipt) if receipt.is_processed else None
+        }
+    finally:
+        db.close()
+
+@router.get("/jobs/{receipt_id}", response_model=OCRJobStatus)
+async def get_ocr_job_status(
+    receipt_id: int,
+    wait: float = 0,
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    """Get OCR status for a receipt. Pass `wait` (seconds) to long-poll until it finishes.
+
+    No connection is held between polls.
+    """
+    deadline = time.monotonic() + min(max(wait, 0), settings.ocr_status_max_wait_seconds)
+    job = await asyncio.to_thread(_job_status, receipt_id, current_user)
+    while job["status"] in (OCRStatus.QUEUED, OCRStatus.PROCESSING) and time.monotonic() < deadline:
+        await asyncio.sleep(settings.ocr_status_poll_seconds)
+        job = await asyncio.to_thread(_job_status, receipt_id, current_user)
+    return job
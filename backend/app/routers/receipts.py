@@ -0,0 +1,148 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.orm import Session
+from typing import Optional
+import os
+from app.database import get_db
+from app.models.receipt import Receipt
+from app.core.dependencies import get_current_active_user
+from app.core.principal import CurrentUser
+from app.core.config import settings
+from app.core.responses import SendfileResponse, etag_matches
+from app.services.ocr_service import OCRPoolSaturated, OCRWorkerError
+from app.services.thumbnails import THUMBNAIL_MEDIA_TYPES, thumbnail_path, thumbnail_service
+
+router = APIRouter()
+
+def _receipt_company_id(receipt: Receipt) -> Optional[int]:
+    """The company a receipt belongs to: its expense's, or else its uploader's.
+
+    Receipts uploaded before uploaders were recorded only have an expense.
+    """
+    if receipt.expense is not None:
+        return receipt.expense.company_id
+    if receipt.uploaded_by is not None:
+        return receipt.uploaded_by.company_id
+    return None
+
+def get_company_receipt(db: Session, receipt_id: int, current_user: CurrentUser) -> Receipt:
+    """Load a receipt belonging to the current user's company, or raise 404/403."""
+    receipt = db.query(Receipt).filter(Receipt.id == receipt_id).first()
+    if not receipt:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Receipt not found"
+        )
+
+    if _receipt_company_id(receipt) != current_user.company_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return receipt
+
+def _stored_file(receipt: Receipt) -> str:
+    if not os.path.isfile(receipt.file_path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Receipt image not available"
+        )
+    return receipt.file_path
+
+@router.get("/{receipt_id}/file")
+async def download_receipt(
+    receipt_id: int,
+    inline: bool = False,
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """The receipt as uploaded, for download or, with `inline`, for display in the browser.
+
+    Supports Range requests and revalidation through the content-hash ETag or Last-Modified.
+    """
+    receipt = get_company_receipt(db, receipt_id, current_user)
+    file_path = _stored_file(receipt)
+
+    return SendfileResponse(
+        file_path,
+        etag=f'"{receipt.content_hash}"' if receipt.content_hash else None,
+        media_type=receipt.mime_type,
+        filename=receipt.original_filename,
+        content_disposition_type="inline" if inline else "attachment",
+        # Cached copies are checked with the ETag before each use
+        headers={"Cache-Control": "private, no-cache"}
+    )
+
+@router.get("/{receipt_id}/thumbnail")
+async def get_receipt_thumbnail(
+    receipt_id: int,
+    request: Request,
+    size: Optional[int] = None,
+    format: Optional[str] = None,
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """A small preview of a receipt, `size` pixels wide, as WebP or JPEG.
+
+    Without `format` the client gets WebP when its Accept header allows it. Thumbnails
+    never change for a receipt, so they carry a strong ETag and may be cached for good.
+    """
+    size = size or thumbnail_service.sizes[0]
+    if size not in thumbnail_service.sizes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Thumbnail size must be one of {', '.join(map(str, thumbnail_service.sizes))}"
+        )
+
+    negotiated = format is None
+    if negotiated:
+        accepts_webp = "image/webp" in request.headers.get("accept", "") and "webp" in thumbnail_service.formats
+        format = "webp" if accepts_webp else thumbnail_service.formats[-1]
+    if format not in thumbnail_service.formats:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Thumbnail format must be one of {', '.join(thumbnail_service.formats)}"
+        )
+
+    receipt = get_company_receipt(db, receipt_id, current_user)
+    file_path = _stored_file(receipt)
+    if not receipt.content_hash:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Receipt image not available"
+        )
+
+    etag = f'"{receipt.content_hash}-{size}-{format}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={settings.receipt_thumbnail_max_age_seconds}, immutable",
+    }
+    if negotiated:
+        headers["Vary"] = "Accept"
+
+    # Answered before the thumbnail is looked up, let alone generated
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        thumbnail_service.not_modified += 1
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # Normally made when the receipt was processed; older receipts get theirs now
+    try:
+        await thumbnail_service.ensure(file_path, receipt.content_hash, on_request=True)
+    except OCRPoolSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Thumbnail is being generated, please retry shortly",
+            headers={"Retry-After": "5"}
+        )
+    except OCRWorkerError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Receipt image could not be read"
+        )
+
+    thumbnail_service.served += 1
+    return SendfileResponse(
+        thumbnail_path(receipt.content_hash, size, format),
+        etag=etag,
+        media_type=THUMBNAIL_MEDIA_TYPES[format],
+        headers=headers
+    )
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List
-from app.database import get_db
+from app.database import get_async_db
 from app.models.user import User, UserRole
 from app.schemas.user import UserCreate, UserUpdate, UserResponse, UserWithCompany
 from app.core.dependencies import get_current_active_user, require_admin, require_manager_or_admin
+from app.core.principal import CurrentUser, user_cache
 
 router = APIRouter()
 
@@ -12,30 +15,37 @@ router = APIRouter()
 async def get_users(
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all users (admin only)."""
-    users = db.query(User).offset(skip).limit(limit).all()
+    users = (await db.execute(select(User).offset(skip).limit(limit))).scalars().all()
     return users
 
 @router.get("/company", response_model=List[UserResponse])
 async def get_company_users(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all users in the same company."""
-    users = db.query(User).filter(User.company_id == current_user.company_id).all()
+    users = (await db.execute(select(User).filter(User.company_id == current_user.company_id))).scalars().all()
     return users
 
 @router.get("/{user_id}", response_model=UserWithCompany)
 async def get_user(
     user_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get user by ID."""
-    user = db.query(User).filter(User.id == user_id).first()
+    # Relationships UserWithCompany reads; an AsyncSession can't load them on access
+    user = (await db.execute(
+        select(User).options(
+            selectinload(User.company),
+            selectinload(User.reporting_manager),
+            selectinload(User.subordinates)
+        ).filter(User.id == user_id)
+    )).scalars().first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -54,12 +64,12 @@ async def get_user(
 @router.post("/", response_model=UserResponse)
 async def create_user(
     user_data: UserCreate,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new user (admin only)."""
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = (await db.execute(select(User).filter(User.email == user_data.email))).scalars().first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -67,8 +77,8 @@ async def create_user(
         )
     
     # Create new user
-    from app.core.security import get_password_hash
-    hashed_password = get_password_hash(user_data.password)
+    from app.core.security import password_hasher
+    hashed_password = await password_hasher.hash(user_data.password)
     
     db_user = User(
         email=user_data.email,
@@ -81,8 +91,8 @@ async def create_user(
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
@@ -90,11 +100,11 @@ async def create_user(
 async def update_user(
     user_id: int,
     user_data: UserUpdate,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update user (admin only)."""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -106,19 +116,20 @@ async def update_user(
     for field, value in update_data.items():
         setattr(user, field, value)
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    user_cache.invalidate(user.id)
     
     return user
 
 @router.delete("/{user_id}")
 async def delete_user(
     user_id: int,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete user (admin only)."""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -132,15 +143,16 @@ async def delete_user(
             detail="Cannot delete your own account"
         )
     
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
+    user_cache.invalidate(user_id)
     
     return {"message": "User deleted successfully"}
 
 @router.get("/subordinates/", response_model=List[UserResponse])
 async def get_subordinates(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get subordinates for managers."""
     if current_user.role not in ["manager", "admin"]:
@@ -149,6 +161,6 @@ async def get_subordinates(
             detail="Not enough permissions"
         )
     
-    subordinates = db.query(User).filter(User.reporting_manager_id == current_user.id).all()
+    subordinates = (await db.execute(select(User).filter(User.reporting_manager_id == current_user.id))).scalars().all()
     return subordinates
 
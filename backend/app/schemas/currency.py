@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional, Tuple
+from app.core.config import settings
+
+class BatchConversionRequest(BaseModel):
+    # (amount, from_currency, to_currency) triples; validation stops at the first item over the cap
+    items: List[Tuple[float, str, str]] = Field(max_length=settings.currency_batch_max_items)
+
+class BatchConversionResponse(BaseModel):
+    count: int
+    # In input order; null where either currency is unknown
+    converted_amounts: List[Optional[float]]
+    rates: List[Optional[float]]
+    unknown_currencies: List[str] = Field(default_factory=list)
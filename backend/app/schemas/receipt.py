@@ -2,6 +2,7 @@ from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
 from decimal import Decimal
+from app.models.receipt import OCRStatus
 
 class ReceiptBase(BaseModel):
     filename: str
@@ -11,19 +12,21 @@ class ReceiptBase(BaseModel):
     mime_type: str
 
 class ReceiptCreate(ReceiptBase):
-    expense_id: int
+    expense_id: Optional[int] = None
 
 class ReceiptResponse(ReceiptBase):
     id: int
     is_processed: bool
     ocr_text: Optional[str]
     ocr_confidence: Optional[str]
+    ocr_confidence_score: Optional[float] = None
     extracted_amount: Optional[str]
     extracted_currency: Optional[str]
     extracted_date: Optional[datetime]
     extracted_merchant: Optional[str]
     extracted_category: Optional[str]
-    expense_id: int
+    ocr_status: OCRStatus
+    expense_id: Optional[int]
     created_at: datetime
     
     class Config:
@@ -32,3 +35,18 @@ class ReceiptResponse(ReceiptBase):
 class ReceiptWithOCR(ReceiptResponse):
     ocr_extracted_data: Optional[dict] = None
 
+class OCRExtractResponse(BaseModel):
+    filename: str
+    file_path: str
+    file_size: int
+    mime_type: str
+    ocr_extracted_data: dict
+
+class OCRJobStatus(BaseModel):
+    receipt_id: int
+    status: OCRStatus
+    is_processed: bool
+    attempts: int
+    error: Optional[str] = None
+    extracted_data: Optional[dict] = None
+
@@ -1,4 +1,6 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from app.models.expense import Expense, ExpenseStatus
 from app.models.approval import Approval, ApprovalRule, ApprovalWorkflow, ApprovalStatus, ApprovalRuleType
 from app.models.user import User
@@ -9,10 +11,10 @@ class ApprovalService:
     def __init__(self):
         pass
     
-    async def start_approval_workflow(self, expense: Expense, db: Session):
+    async def start_approval_workflow(self, expense: Expense, db: AsyncSession):
         """Start approval workflow for an expense."""
         # Get applicable approval rule
-        rule = self._get_applicable_rule(expense, db)
+        rule = await self._get_applicable_rule(expense, db)
         if not rule:
             # No approval required
             expense.status = ExpenseStatus.APPROVED
@@ -25,7 +27,7 @@ class ApprovalService:
             total_steps=self._calculate_total_steps(rule, expense)
         )
         db.add(workflow)
-        db.flush()
+        await db.flush()
         
         # Create approval records
         await self._create_approval_records(workflow, rule, expense, db)
@@ -33,14 +35,16 @@ class ApprovalService:
         # Update expense status
         expense.status = ExpenseStatus.PENDING_APPROVAL
     
-    def _get_applicable_rule(self, expense: Expense, db: Session) -> ApprovalRule:
+    async def _get_applicable_rule(self, expense: Expense, db: AsyncSession) -> ApprovalRule:
         """Get applicable approval rule for expense."""
         # For now, get the first active rule for the company
         # In a real system, this would be more sophisticated
-        rule = db.query(ApprovalRule).filter(
-            ApprovalRule.company_id == expense.company_id,
-            ApprovalRule.is_active == True
-        ).first()
+        rule = (await db.execute(
+            select(ApprovalRule).options(selectinload(ApprovalRule.approvers)).filter(
+                ApprovalRule.company_id == expense.company_id,
+                ApprovalRule.is_active == True
+            ).limit(1)
+        )).scalars().first()
         
         return rule
     
@@ -50,14 +54,17 @@ class ApprovalService:
             return len(rule.approvers) + 1  # +1 for manager
         return len(rule.approvers)
     
-    async def _create_approval_records(self, workflow: ApprovalWorkflow, rule: ApprovalRule, expense: Expense, db: Session):
+    async def _create_approval_records(self, workflow: ApprovalWorkflow, rule: ApprovalRule, expense: Expense, db: AsyncSession):
         """Create approval records for workflow."""
         # Get manager if required
         manager = None
         if rule.requires_manager_approval:
-            manager = db.query(User).filter(
-                User.id == expense.submitter.reporting_manager_id
-            ).first()
+            reporting_manager_id = select(User.reporting_manager_id).filter(
+                User.id == expense.submitter_id
+            ).scalar_subquery()
+            manager = (await db.execute(
+                select(User).filter(User.id == reporting_manager_id)
+            )).scalars().first()
         
         # Create approvals based on rule type
         if rule.rule_type == ApprovalRuleType.SEQUENTIAL:
@@ -70,7 +77,7 @@ class ApprovalService:
             # Default to parallel
             await self._create_parallel_approvals(workflow, rule, manager, db)
     
-    async def _create_sequential_approvals(self, workflow: ApprovalWorkflow, rule: ApprovalRule, manager: User, db: Session):
+    async def _create_sequential_approvals(self, workflow: ApprovalWorkflow, rule: ApprovalRule, manager: User, db: AsyncSession):
         """Create sequential approval records."""
         step = 1
         
@@ -95,7 +102,7 @@ class ApprovalService:
             )
             db.add(approval)
     
-    async def _create_parallel_approvals(self, workflow: ApprovalWorkflow, rule: ApprovalRule, manager: User, db: Session):
+    async def _create_parallel_approvals(self, workflow: ApprovalWorkflow, rule: ApprovalRule, manager: User, db: AsyncSession):
         """Create parallel approval records."""
         # Manager approval if required
         if rule.requires_manager_approval and manager:
@@ -117,21 +124,19 @@ class ApprovalService:
             )
             db.add(approval)
     
-    async def _create_percentage_approvals(self, workflow: ApprovalWorkflow, rule: ApprovalRule, manager: User, db: Session):
+    async def _create_percentage_approvals(self, workflow: ApprovalWorkflow, rule: ApprovalRule, manager: User, db: AsyncSession):
         """Create percentage-based approval records."""
         # Similar to parallel but with percentage logic
         await self._create_parallel_approvals(workflow, rule, manager, db)
     
-    async def process_approval(self, approval: Approval, db: Session):
+    async def process_approval(self, approval: Approval, db: AsyncSession):
         """Process an approval decision."""
         # Update approval
         approval.status = ApprovalStatus.APPROVED
         approval.approved_at = datetime.utcnow()
         
         # Get workflow
-        workflow = db.query(ApprovalWorkflow).filter(
-            ApprovalWorkflow.id == approval.workflow_id
-        ).first()
+        workflow = await db.get(ApprovalWorkflow, approval.workflow_id)
         
         # Update workflow progress
         workflow.completed_steps += 1
@@ -143,35 +148,39 @@ class ApprovalService:
             # Move to next step if sequential
             await self._move_to_next_step(workflow, db)
     
-    async def process_rejection(self, approval: Approval, db: Session):
+    async def process_rejection(self, approval: Approval, db: AsyncSession):
         """Process a rejection."""
         # Update approval
         approval.status = ApprovalStatus.REJECTED
         approval.approved_at = datetime.utcnow()
         
         # Get workflow and expense
-        workflow = db.query(ApprovalWorkflow).filter(
-            ApprovalWorkflow.id == approval.workflow_id
-        ).first()
+        workflow = await db.get(ApprovalWorkflow, approval.workflow_id)
         
-        expense = db.query(Expense).filter(Expense.id == workflow.expense_id).first()
+        expense = await db.get(Expense, workflow.expense_id)
         
         # Reject the expense
         expense.status = ExpenseStatus.REJECTED
         
         # Cancel remaining approvals
-        remaining_approvals = db.query(Approval).filter(
-            Approval.workflow_id == workflow.id,
-            Approval.status == ApprovalStatus.PENDING
-        ).all()
+        remaining_approvals = (await db.execute(
+            select(Approval).filter(
+                Approval.workflow_id == workflow.id,
+                Approval.status == ApprovalStatus.PENDING
+            )
+        )).scalars().all()
         
         for remaining_approval in remaining_approvals:
             remaining_approval.status = ApprovalStatus.REJECTED
     
-    async def _is_workflow_complete(self, workflow: ApprovalWorkflow, db: Session) -> bool:
+    async def _is_workflow_complete(self, workflow: ApprovalWorkflow, db: AsyncSession) -> bool:
         """Check if workflow is complete."""
         # Get rule
-        rule = db.query(ApprovalRule).filter(ApprovalRule.id == workflow.rule_id).first()
+        rule = (await db.execute(
+            select(ApprovalRule).options(selectinload(ApprovalRule.approvers)).filter(
+                ApprovalRule.id == workflow.rule_id
+            )
+        )).scalars().first()
         
         if rule.rule_type == ApprovalRuleType.PERCENTAGE:
             # Check percentage completion
@@ -179,32 +188,36 @@ class ApprovalService:
             if rule.requires_manager_approval:
                 total_approvals += 1
             
-            approved_count = db.query(Approval).filter(
-                Approval.workflow_id == workflow.id,
-                Approval.status == ApprovalStatus.APPROVED
-            ).count()
+            approved_count = await db.scalar(
+                select(func.count()).select_from(Approval).filter(
+                    Approval.workflow_id == workflow.id,
+                    Approval.status == ApprovalStatus.APPROVED
+                )
+            )
             
             required_approvals = int(total_approvals * rule.minimum_approval_percentage / 100)
             return approved_count >= required_approvals
         else:
             # All approvals must be completed
-            pending_approvals = db.query(Approval).filter(
-                Approval.workflow_id == workflow.id,
-                Approval.status == ApprovalStatus.PENDING
-            ).count()
+            pending_approvals = await db.scalar(
+                select(func.count()).select_from(Approval).filter(
+                    Approval.workflow_id == workflow.id,
+                    Approval.status == ApprovalStatus.PENDING
+                )
+            )
             
             return pending_approvals == 0
     
-    async def _complete_workflow(self, workflow: ApprovalWorkflow, db: Session):
+    async def _complete_workflow(self, workflow: ApprovalWorkflow, db: AsyncSession):
         """Complete the approval workflow."""
         # Update expense status
-        expense = db.query(Expense).filter(Expense.id == workflow.expense_id).first()
+        expense = await db.get(Expense, workflow.expense_id)
         expense.status = ExpenseStatus.APPROVED
         
         # Update workflow status
         workflow.status = ApprovalStatus.APPROVED
     
-    async def _move_to_next_step(self, workflow: ApprovalWorkflow, db: Session):
+    async def _move_to_next_step(self, workflow: ApprovalWorkflow, db: AsyncSession):
         """Move to next step in sequential workflow."""
         # This would implement sequential approval logic
         # For now, just update the current step
@@ -0,0 +1,270 @@
+import asyncio
+import random
+import time
+import httpx
+from datetime import date, timedelta
+from typing import Dict, Any, Optional
+from app.core.config import settings
+
+class CurrencyProviderError(Exception):
+    """Raised when a rate table cannot be fetched from the provider."""
+
+class CircuitOpenError(CurrencyProviderError):
+    """Raised when the circuit breaker is rejecting calls."""
+
+class CurrencyRequestError(CurrencyProviderError):
+    """Raised when the provider answered but refused the request, e.g. for an unknown currency."""
+
+class CircuitBreaker:
+    """Stop calling an upstream that keeps failing, then probe it again after a cool-down."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        """Return whether a call may go out right now."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            # Let a single probe through
+            self.state = self.HALF_OPEN
+            return True
+        if self.state == self.HALF_OPEN:
+            return False
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+
+    def record_abandoned(self):
+        """A call ended without an answer either way; a half-open probe goes to the next caller."""
+        if self.state == self.HALF_OPEN:
+            # opened_at is past the cool-down, so the next allow() probes straight away
+            self.state = self.OPEN
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+        }
+
+class ExchangeRateAPIProvider:
+    """Rate tables from exchangerate-api over a pooled keep-alive HTTP client."""
+
+    name = "exchangerate-api"
+
+    def __init__(self):
+        self.api_url = settings.currency_api_url
+        self.api_key = settings.currency_api_key
+        self.history_api_url = settings.currency_history_api_url
+        self.max_retries = settings.currency_http_max_retries
+        self.backoff_seconds = settings.currency_http_backoff_seconds
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.currency_circuit_failure_threshold,
+            reset_timeout=settings.currency_circuit_reset_seconds
+        )
+        # The history API is a separate host; a failing backfill mustn't block live rates
+        self.history_breaker = CircuitBreaker(
+            failure_threshold=settings.currency_circuit_failure_threshold,
+            reset_timeout=settings.currency_circuit_reset_seconds
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    async def start(self):
+        """Open the shared HTTP client."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(
+                    settings.currency_http_timeout_seconds,
+                    connect=settings.currency_http_connect_timeout_seconds
+                ),
+                limits=httpx.Limits(
+                    max_connections=settings.currency_http_max_connections,
+                    max_keepalive_connections=settings.currency_http_max_connections
+                )
+            )
+
+    async def close(self):
+        """Close the shared HTTP client and its pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def fetch_rates(self, base_currency: str) -> Dict[str, float]:
+        """Fetch the latest rate table for a base currency."""
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else None
+        data = await self._get_json(self.breaker, f"{self.api_url}/{base_currency}", headers=headers)
+        return data["rates"]
+
+    async def fetch_history(self, base_currency: str, start: date, end: date) -> Dict[date, Dict[str, float]]:
+        """Fetch daily rate tables for a date range from the history API.
+
+        Only publication days are returned; weekends and holidays are absent.
+        """
+        data = await self._get_json(
+            self.history_breaker,
+            f"{self.history_api_url}/{start.isoformat()}..{end.isoformat()}",
+            params={"from": base_currency}
+        )
+        return {
+            date.fromisoformat(day): {**rates, base_currency: 1.0}
+            for day, rates in data["rates"].items()
+        }
+
+    async def _get_json(self, breaker: CircuitBreaker, url: str, params: Optional[dict] = None, headers: Optional[dict] = None) -> Dict[str, Any]:
+        """GET a JSON document behind the given circuit breaker.
+
+        Every way out of the call records an outcome, so a half-open breaker can't be left waiting
+        on a probe that was cancelled or failed unexpectedly.
+        """
+        if not breaker.allow():
+            raise CircuitOpenError("Currency API circuit is open")
+
+        try:
+            data = await self._get_json_with_retries(url, params, headers)
+        except CurrencyRequestError:
+            # The upstream is up; the request itself is bad
+            breaker.record_success()
+            raise
+        except asyncio.CancelledError:
+            breaker.record_abandoned()
+            raise
+        except BaseException:
+            self.failures += 1
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        return data
+
+    async def _get_json_with_retries(self, url: str, params: Optional[dict], headers: Optional[dict]) -> Dict[str, Any]:
+        """GET a JSON document, retrying transport errors, 429s and 5xx responses with backoff."""
+        await self.start()
+        last_error: Optional[Exception] = None
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+                # Full jitter keeps retries from many workers from lining up
+                await asyncio.sleep(random.uniform(0, self.backoff_seconds * (2 ** attempt)))
+            try:
+                self.requests += 1
+                response = await self._client.get(url, params=params, headers=headers)
+            except httpx.TransportError as e:
+                last_error = e
+                continue
+            if response.status_code == 429 or response.status_code >= 500:
+                last_error = CurrencyProviderError(f"Currency API returned {response.status_code}")
+                continue
+            if response.is_error:
+                raise CurrencyRequestError(f"Currency API rejected the request with {response.status_code}")
+
+            try:
+                data = response.json()
+                if not isinstance(data.get("rates"), dict):
+                    raise ValueError("no rates table")
+            except (AttributeError, ValueError) as e:
+                raise CurrencyProviderError(f"Invalid currency API response: {e}") from e
+            return data
+
+        raise CurrencyProviderError(f"Currency API unavailable: {last_error}") from last_error
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "provider": self.name,
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "circuit": self.breaker.stats(),
+            "history_circuit": self.history_breaker.stats(),
+        }
+
+class StubRateProvider:
+    """Offline provider with fixed rates, for local development and load tests."""
+
+    name = "stub"
+
+    # Units of each currency per USD
+    USD_RATES = {
+        "USD": 1.0,
+        "EUR": 0.92,
+        "GBP": 0.79,
+        "INR": 83.1,
+        "CAD": 1.36,
+        "AUD": 1.52,
+        "JPY": 149.5,
+        "CHF": 0.88,
+        "CNY": 7.24,
+        "SGD": 1.34,
+    }
+
+    def __init__(self, latency_seconds: Optional[float] = None):
+        if latency_seconds is None:
+            latency_seconds = settings.currency_stub_latency_ms / 1000
+        self.latency_seconds = latency_seconds
+        self.requests = 0
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def fetch_rates(self, base_currency: str) -> Dict[str, float]:
+        """Return the fixed table re-based on the requested currency."""
+        self.requests += 1
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+
+        base_rate = self.USD_RATES.get(base_currency)
+        if base_rate is None:
+            raise CurrencyProviderError(f"Unsupported base currency: {base_currency}")
+        return {code: rate / base_rate for code, rate in self.USD_RATES.items()}
+
+    async def fetch_history(self, base_currency: str, start: date, end: date) -> Dict[date, Dict[str, float]]:
+        """Return the fixed table for every weekday in the range."""
+        rates = await self.fetch_rates(base_currency)
+        days = (start + timedelta(days=offset) for offset in range((end - start).days + 1))
+        return {day: rates for day in days if day.weekday() < 5}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"provider": self.name, "requests": self.requests}
+
+_provider = None
+
+def get_currency_provider():
+    """Return the process-wide currency provider selected in settings."""
+    global _provider
+    if _provider is None:
+        if settings.currency_provider == "stub":
+            _provider = StubRateProvider()
+        else:
+            _provider = ExchangeRateAPIProvider()
+    return _provider
+
+async def close_currency_provider():
+    """Release the provider's pooled connections."""
+    global _provider
+    if _provider is not None:
+        await _provider.close()
+        _provider = None
@@ -1,57 +1,227 @@
-import requests
-from typing import Dict, Any
+import asyncio
+import operator
+import time
+import numpy as np
+from functools import partial
+from itertools import repeat
+from typing import Dict, Any, List, Optional, Tuple
 from decimal import Decimal
 from app.core.config import settings
+from app.models.company import Currency
+from app.services.currency_provider import get_currency_provider
+
+class RateMatrix:
+    """Dense cross-rate matrix derived from a single base-currency table.
+
+    ``matrix[index[a], index[b]]`` is the number of units of ``b`` per unit of ``a``.
+    """
+
+    def __init__(self, base_currency: str, base_rates: Dict[str, float]):
+        missing = [currency.value for currency in Currency if currency.value not in base_rates]
+        if missing:
+            print(f"Currency API error: no {base_currency} rate for {', '.join(missing)}")
+
+        self.base_currency = base_currency
+        self.codes: List[str] = sorted(code for code, rate in base_rates.items() if rate)
+        self.index: Dict[str, int] = {code: i for i, code in enumerate(self.codes)}
+        base_vector = np.array([base_rates[code] for code in self.codes], dtype=np.float64)
+        self.matrix = base_vector[np.newaxis, :] / base_vector[:, np.newaxis]
+
+    def rate(self, from_currency: str, to_currency: str) -> Optional[float]:
+        """Units of `to_currency` per unit of `from_currency`, or None if either is unknown."""
+        i = self.index.get(from_currency)
+        j = self.index.get(to_currency)
+        if i is None or j is None:
+            return None
+        return float(self.matrix[i, j])
+
+    def rates_for(self, base_currency: str) -> Dict[str, float]:
+        """Full rate table re-based on any known currency."""
+        i = self.index.get(base_currency)
+        if i is None:
+            return {}
+        return dict(zip(self.codes, self.matrix[i].tolist()))
+
+    def convert_batch(self, amounts: List[float], from_currencies: List[str], to_currencies: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Convert many amounts in one vectorized lookup.
+
+        Returns (converted_amounts, rates) in input order, NaN where a currency is unknown.
+        Same-currency pairs convert at 1.0 even for unknown codes, as in `get_exchange_rate`.
+        """
+        count = len(amounts)
+        lookup = self.index.get
+        from_idx = np.fromiter(map(lookup, from_currencies, repeat(-1)), dtype=np.intp, count=count)
+        to_idx = np.fromiter(map(lookup, to_currencies, repeat(-1)), dtype=np.intp, count=count)
+        same = np.fromiter(map(operator.eq, from_currencies, to_currencies), dtype=bool, count=count)
+
+        rates = self.matrix[from_idx, to_idx]
+        rates[(from_idx < 0) | (to_idx < 0)] = np.nan
+        rates[same] = 1.0
+        return np.asarray(amounts, dtype=np.float64) * rates, rates
+
+class RateCache:
+    """Shared in-process cross-rate matrices keyed by the base currency they were fetched in."""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._tables: Dict[str, Tuple[RateMatrix, float]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def get(self, base_currency: str) -> Optional[Tuple[RateMatrix, float]]:
+        """Return (matrix, fetched_at) for a base currency, fresh or not."""
+        return self._tables.get(base_currency)
+
+    def set(self, base_currency: str, matrix: RateMatrix):
+        """Store a freshly built rate matrix."""
+        self._tables[base_currency] = (matrix, time.monotonic())
+
+    def age(self, base_currency: str) -> Optional[float]:
+        """Seconds since the table for a base currency was fetched."""
+        entry = self._tables.get(base_currency)
+        if entry is None:
+            return None
+        return time.monotonic() - entry[1]
+
+    def is_fresh(self, base_currency: str) -> bool:
+        age = self.age(base_currency)
+        return age is not None and age < self.ttl_seconds
+
+    def bases(self):
+        return list(self._tables.keys())
+
+    def clear(self):
+        self._tables.clear()
+
+    def _finish_refresh(self, base_currency: str, task: asyncio.Task):
+        self._inflight.pop(base_currency, None)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Currency API error: {task.exception()}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and per-base table ages."""
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "ttl_seconds": self.ttl_seconds,
+            "age_seconds": {base: round(self.age(base), 3) for base in self.bases()},
+        }
+
+rate_cache = RateCache(ttl_seconds=settings.currency_cache_ttl_seconds)
 
 class CurrencyService:
-    def __init__(self):
-        self.api_url = settings.currency_api_url
-        self.api_key = settings.currency_api_key
-    
+    def __init__(self, provider=None):
+        self.provider = provider or get_currency_provider()
+        self.cache = rate_cache
+        self.base_currency = settings.currency_base_currency
+
     async def get_exchange_rate(self, from_currency: str, to_currency: str) -> float:
         """Get exchange rate between two currencies."""
         try:
             if from_currency == to_currency:
                 return 1.0
-            
-            # Use free API (no key required)
-            url = f"https://api.exchangerate-api.com/v4/latest/{from_currency}"
-            response = requests.get(url)
-            response.raise_for_status()
-            
-            data = response.json()
-            return data["rates"].get(to_currency, 1.0)
-            
+
+            matrix = await self.get_rate_matrix()
+            rate = matrix.rate(from_currency, to_currency)
+            return rate if rate is not None else 1.0
+
         except Exception as e:
             # Fallback to 1.0 if API fails
             print(f"Currency API error: {e}")
             return 1.0
-    
+
     async def get_all_rates(self, base_currency: str = "USD") -> Dict[str, float]:
         """Get all exchange rates for a base currency."""
         try:
-            url = f"https://api.exchangerate-api.com/v4/latest/{base_currency}"
-            response = requests.get(url)
-            response.raise_for_status()
-            
-            data = response.json()
-            return data["rates"]
-            
+            matrix = await self.get_rate_matrix()
+            return matrix.rates_for(base_currency)
+
         except Exception as e:
             print(f"Currency API error: {e}")
             return {}
-    
+
     async def convert_amount(self, amount: float, from_currency: str, to_currency: str) -> float:
         """Convert amount from one currency to another."""
         rate = await self.get_exchange_rate(from_currency, to_currency)
         return amount * rate
-    
+
+    async def refresh(self, base_currency: str) -> RateMatrix:
+        """Fetch a rate table from the API and store its cross-rate matrix in the cache.
+
+        Concurrent refreshes of the same base currency share one upstream request.
+        """
+        # Shield so a cancelled waiter doesn't cancel the fetch other waiters share
+        return await asyncio.shield(self._start_refresh(base_currency))
+
+    def _start_refresh(self, base_currency: str) -> asyncio.Task:
+        """Return the in-flight fetch for a base currency, starting one if needed."""
+        task = self.cache._inflight.get(base_currency)
+        if task is not None:
+            self.cache.coalesced += 1
+            return task
+
+        task = asyncio.create_task(self._fetch_and_store(base_currency))
+        self.cache._inflight[base_currency] = task
+        task.add_done_callback(partial(self.cache._finish_refresh, base_currency))
+        return task
+
+    async def _fetch_and_store(self, base_currency: str) -> RateMatrix:
+        try:
+            rates = await self._fetch_rates(base_currency)
+        except Exception:
+            self.cache.refresh_errors += 1
+            raise
+        matrix = RateMatrix(base_currency, rates)
+        self.cache.set(base_currency, matrix)
+        self.cache.refreshes += 1
+        return matrix
+
+    async def get_rate_matrix(self) -> RateMatrix:
+        """Serve the cross-rate matrix from the cache, revalidating stale entries in the background."""
+        base_currency = self.base_currency
+        entry = self.cache.get(base_currency)
+        if entry is None:
+            self.cache.misses += 1
+            return await self.refresh(base_currency)
+
+        matrix, _ = entry
+        if self.cache.is_fresh(base_currency):
+            self.cache.hits += 1
+        else:
+            # Stale-while-revalidate: answer now, refresh behind the request
+            self.cache.stale_hits += 1
+            if base_currency not in self.cache._inflight:
+                self._start_refresh(base_currency)
+        return matrix
+
+    async def _refresh_quietly(self, base_currency: str):
+        try:
+            await self.refresh(base_currency)
+        except Exception:
+            # Already reported when the shared fetch finished
+            pass
+
+    async def _fetch_rates(self, base_currency: str) -> Dict[str, float]:
+        """Download the rate table for a base currency."""
+        return await self.provider.fetch_rates(base_currency)
+
     async def get_currency_for_country(self, country: str) -> str:
         """Get default currency for a country."""
         country_currency_map = {
             "United States": "USD",
             "United Kingdom": "GBP",
-            "European Union": "EUR", 
+            "European Union": "EUR",
             "India": "INR",
             "Canada": "CAD",
             "Australia": "AUD",
@@ -63,3 +233,34 @@ class CurrencyService:
         }
         return country_currency_map.get(country, "USD")
 
+_refresher_task: Optional[asyncio.Task] = None
+
+async def _refresh_loop():
+    """Refresh the cached rate matrix shortly before it expires."""
+    service = CurrencyService()
+    await service._refresh_quietly(service.base_currency)
+
+    refresh_after = max(rate_cache.ttl_seconds - settings.currency_refresh_margin_seconds, 0)
+    while True:
+        await asyncio.sleep(settings.currency_refresh_interval_seconds)
+        for base_currency in rate_cache.bases():
+            age = rate_cache.age(base_currency)
+            if age is not None and age >= refresh_after:
+                await service._refresh_quietly(base_currency)
+
+def start_rate_refresher():
+    """Start the background rate refresher on the running event loop."""
+    global _refresher_task
+    if _refresher_task is None or _refresher_task.done():
+        _refresher_task = asyncio.create_task(_refresh_loop())
+
+async def stop_rate_refresher():
+    """Cancel the background rate refresher."""
+    global _refresher_task
+    if _refresher_task is not None:
+        _refresher_task.cancel()
+        try:
+            await _refresher_task
+        except asyncio.CancelledError:
+            pass
+        _refresher_task = None
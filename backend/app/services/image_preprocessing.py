@@ -0,0 +1,188 @@
+import time
+import numpy as np
+from PIL import ExifTags, Image, ImageOps
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+
+# Steps in the order they are applied; settings pick which of them run
+PREPROCESS_STEPS = ("exif_transpose", "grayscale", "crop", "resize", "binarize", "deskew")
+
+# Cameras stamp 72 or 96 DPI on every photo; only higher values describe the paper
+MIN_TRUSTED_DPI = 150
+
+# Never enlarge small images more than this; upscaling adds pixels, not detail
+MAX_UPSCALE = 2.0
+
+# EXIF orientations stored a quarter turn from upright, so width and height swap when transposed
+QUARTER_TURN_ORIENTATIONS = (5, 6, 7, 8)
+
+# Deskew searches on a thumbnail this wide, then rotates the full image once
+DESKEW_SEARCH_WIDTH = 400
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """Grey level that best separates the histogram into ink and paper."""
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight_dark = np.cumsum(histogram)
+    weight_light = weight_dark[-1] - weight_dark
+    mass_dark = np.cumsum(histogram * levels)
+    mean_dark = mass_dark / np.maximum(weight_dark, 1)
+    mean_light = (mass_dark[-1] - mass_dark) / np.maximum(weight_light, 1)
+    between_variance = weight_dark * weight_light * (mean_dark - mean_light) ** 2
+    return int(np.argmax(between_variance))
+
+class ImagePreprocessor:
+    """Prepares receipt photos for Tesseract: upright, grey, at the target DPI and high contrast.
+
+    Instances only hold settings, so they can be pickled into OCR worker processes.
+    """
+
+    def __init__(
+        self,
+        steps: Optional[List[str]] = None,
+        target_dpi: Optional[int] = None,
+        receipt_width_inches: Optional[float] = None,
+        deskew_max_angle: Optional[float] = None
+    ):
+        if steps is None:
+            steps = settings.ocr_preprocess_steps if settings.ocr_preprocess_enabled else []
+        unknown = set(steps) - set(PREPROCESS_STEPS)
+        if unknown:
+            raise ValueError(f"Unknown preprocessing steps: {', '.join(sorted(unknown))}")
+
+        self.steps = [step for step in PREPROCESS_STEPS if step in steps]
+        self.target_dpi = target_dpi or settings.ocr_target_dpi
+        self.receipt_width_inches = receipt_width_inches or settings.ocr_receipt_width_inches
+        self.deskew_max_angle = deskew_max_angle if deskew_max_angle is not None else settings.ocr_deskew_max_angle
+
+    def process(self, image: Image.Image) -> Tuple[Image.Image, Dict[str, float]]:
+        """Run the configured steps, returning the image and per-step timings in milliseconds."""
+        timings = {}
+        # The crop box isn't known until the pixels load, so a drafted photo could leave the
+        # receipt itself below the target DPI
+        if "resize" in self.steps and "crop" not in self.steps:
+            self._draft(image)
+        for step in self.steps:
+            started = time.perf_counter()
+            image = getattr(self, f"_{step}")(image)
+            timings[step] = (time.perf_counter() - started) * 1000
+        return image, timings
+
+    def _scale(self, image: Image.Image, width: Optional[int] = None) -> float:
+        """Factor that renders the receipt at the target DPI.
+
+        Uses the DPI stored in the file when it looks like a scan, otherwise assumes
+        the image, `width` pixels wide when upright, is as wide as a receipt.
+        """
+        dpi = image.info.get("dpi")
+        if dpi and dpi[0] >= MIN_TRUSTED_DPI:
+            scale = self.target_dpi / float(dpi[0])
+        else:
+            scale = self.target_dpi * self.receipt_width_inches / (width or image.width)
+        return min(scale, MAX_UPSCALE)
+
+    def _draft(self, image: Image.Image):
+        """Have the JPEG decoder shrink by a power of two while decoding, before any pixels load."""
+        if image.format != "JPEG":
+            return
+        # Pick the scale _resize will, which sees the photo after it is turned upright
+        width = image.width
+        if "exif_transpose" in self.steps and image.getexif().get(ExifTags.Base.Orientation) in QUARTER_TURN_ORIENTATIONS:
+            width = image.height
+        scale = self._scale(image, width)
+        if scale >= 0.5:
+            return
+        original_width = image.width
+        image.draft(image.mode, (round(image.width * scale), round(image.height * scale)))
+        dpi = image.info.get("dpi")
+        if dpi and image.width != original_width:
+            ratio = image.width / original_width
+            image.info["dpi"] = (dpi[0] * ratio, dpi[1] * ratio)
+
+    def _exif_transpose(self, image: Image.Image) -> Image.Image:
+        """Rotate phone photos to the orientation recorded in their EXIF data."""
+        return ImageOps.exif_transpose(image)
+
+    def _grayscale(self, image: Image.Image) -> Image.Image:
+        return image.convert("L")
+
+    def _resize(self, image: Image.Image) -> Image.Image:
+        """Scale the receipt to the target DPI; most phone photos shrink several times over."""
+        scale = self._scale(image)
+        if 0.95 <= scale <= 1.05:
+            return image
+
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        resized = image.resize(size, Image.LANCZOS if scale < 1 else Image.BICUBIC)
+        resized.info["dpi"] = (self.target_dpi, self.target_dpi)
+        return resized
+
+    def _crop(self, image: Image.Image) -> Image.Image:
+        """Trim the background around a light receipt photographed on a darker surface."""
+        gray = np.asarray(image.convert("L"))
+        paper = gray > otsu_threshold(gray)
+        rows = np.flatnonzero(paper.mean(axis=1) > 0.5)
+        cols = np.flatnonzero(paper.mean(axis=0) > 0.5)
+        if rows.size == 0 or cols.size == 0:
+            return image
+
+        top, bottom, left, right = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+        # Don't trust a box that would throw away most of the photo
+        if (bottom - top) * (right - left) < 0.2 * gray.size:
+            return image
+        return image.crop((left, top, right, bottom))
+
+    def _binarize(self, image: Image.Image) -> Image.Image:
+        """Global Otsu threshold; receipts are dark ink on roughly uniform paper."""
+        gray = np.asarray(image.convert("L"))
+        threshold = otsu_threshold(gray)
+        return Image.fromarray(np.where(gray > threshold, 255, 0).astype(np.uint8))
+
+    def _deskew(self, image: Image.Image) -> Image.Image:
+        """Rotate by the angle whose horizontal projection has the sharpest text lines."""
+        if not self.deskew_max_angle:
+            return image
+
+        scale = min(1.0, DESKEW_SEARCH_WIDTH / image.width)
+        thumbnail = image.convert("L").resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))))
+        ink = Image.fromarray(255 - np.asarray(thumbnail))
+
+        best_angle, best_score = 0.0, -1.0
+        for angle in np.arange(-self.deskew_max_angle, self.deskew_max_angle + 0.01, 0.5):
+            rows = np.asarray(ink.rotate(float(angle), resample=Image.NEAREST)).sum(axis=1, dtype=np.float64)
+            score = float(np.var(rows))
+            if score > best_score:
+                best_angle, best_score = float(angle), score
+
+        if abs(best_angle) < 0.25:
+            return image
+        fill = 255 if image.mode == "L" else None
+        return image.rotate(best_angle, resample=Image.BICUBIC, expand=True, fillcolor=fill)
+
+class PreprocessStats:
+    """Running per-step preprocessing timings reported by OCR workers."""
+
+    def __init__(self):
+        self.images = 0
+        self.total_ms: Dict[str, float] = {}
+        self.max_ms: Dict[str, float] = {}
+
+    def record(self, timings: Dict[str, float]):
+        self.images += 1
+        for step, elapsed in timings.items():
+            self.total_ms[step] = self.total_ms.get(step, 0.0) + elapsed
+            self.max_ms[step] = max(self.max_ms.get(step, 0.0), elapsed)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "images": self.images,
+            "steps": {
+                step: {
+                    "avg_ms": round(total / self.images, 2),
+                    "max_ms": round(self.max_ms[step], 2),
+                }
+                for step, total in self.total_ms.items()
+            },
+        }
+
+preprocess_stats = PreprocessStats()
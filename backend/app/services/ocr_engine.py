@@ -0,0 +1,267 @@
+import time
+import pytesseract
+from PIL import Image
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from app.core.config import settings
+
+try:
+    import tesserocr
+except ImportError:  # Needs libtesseract; pytesseract only needs the binary
+    tesserocr = None
+
+OCR_BACKENDS = ("tesserocr", "pytesseract")
+
+# Columns of Tesseract's TSV output, as pytesseract's DICT output names them
+_TSV_COLUMNS = ("level", "page_num", "block_num", "par_num", "line_num", "word_num", "left", "top", "width", "height")
+
+# A second pass reads one line as a single text line, enlarged towards this height
+# in pixels but never more than REOCR_MAX_SCALE times
+REOCR_LINE_HEIGHT = 64
+REOCR_MAX_SCALE = 2.0
+REOCR_PSM = 7
+
+class OCRWord(NamedTuple):
+    start: int  # Offsets of the word in the page text
+    end: int
+    confidence: float  # Tesseract's 0-100 word confidence
+
+class OCRPageResult(NamedTuple):
+    text: str
+    words: List[OCRWord]
+    reocr_regions: int  # Low-confidence lines read a second time
+    reocr_improved: int  # Of those, lines whose second reading was kept
+    reocr_ms: float
+    backend: str  # Backend that actually ran, after any fallback
+
+def _data_lines(data: Dict[str, list]) -> List[dict]:
+    """Group Tesseract's word rows into lines, with word confidences and the line's bounding box."""
+    lines: Dict[Tuple[int, int, int], dict] = {}
+    for i, text in enumerate(data["text"]):
+        confidence = float(data["conf"][i])
+        text = text.strip()
+        if confidence < 0 or not text:
+            continue
+
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        left, top = data["left"][i], data["top"][i]
+        right, bottom = left + data["width"][i], top + data["height"][i]
+        line = lines.setdefault(key, {"words": [], "box": [left, top, right, bottom]})
+        line["words"].append((text, confidence))
+        box = line["box"]
+        line["box"] = [min(box[0], left), min(box[1], top), max(box[2], right), max(box[3], bottom)]
+    return [dict(line, key=key) for key, line in lines.items()]
+
+def _tsv_to_data(tsv: str) -> Dict[str, list]:
+    """Parse Tesseract's TSV output into the column lists pytesseract returns."""
+    data: Dict[str, list] = {column: [] for column in (*_TSV_COLUMNS, "conf", "text")}
+    for row in tsv.splitlines():
+        fields = row.split("\t")
+        if len(fields) < 11:
+            continue
+        for column, value in zip(_TSV_COLUMNS, fields):
+            data[column].append(int(value))
+        data["conf"].append(float(fields[10]))
+        data["text"].append(fields[11] if len(fields) > 11 else "")
+    return data
+
+# The worker process's Tesseract instance, which keeps its language data loaded between jobs
+_tesserocr_api = None
+_tesserocr_failed = False
+
+def _warm_api(tessdata_path: Optional[str]):
+    """This process's tesserocr API, created on first use; None when it can't be initialised."""
+    global _tesserocr_api, _tesserocr_failed
+    if _tesserocr_api is None and not _tesserocr_failed:
+        try:
+            _tesserocr_api = tesserocr.PyTessBaseAPI(path=tessdata_path) if tessdata_path else tesserocr.PyTessBaseAPI()
+        except RuntimeError as e:
+            # Usually missing language data; keep OCR working through the binary
+            print(f"tesserocr unavailable, falling back to pytesseract: {e}")
+            _tesserocr_failed = True
+    return _tesserocr_api
+
+_missing_tesserocr_reported = False
+
+def _report_missing_tesserocr():
+    """Say once per process that tesserocr is missing; recognizers are built for every job."""
+    global _missing_tesserocr_reported
+    if not _missing_tesserocr_reported:
+        print("tesserocr is not installed, falling back to pytesseract")
+        _missing_tesserocr_reported = True
+
+def _mean_confidence(words: List[Tuple[str, float]]) -> float:
+    return sum(confidence for _, confidence in words) / len(words)
+
+class TesseractRecognizer:
+    """Runs Tesseract with word-level output and re-reads only the lines it was unsure of.
+
+    Instances only hold settings, so they can be pickled into OCR worker processes.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[str] = None,
+        tesseract_cmd: Optional[str] = None,
+        tessdata_path: Optional[str] = None,
+        low_confidence: Optional[float] = None,
+        max_reocr_regions: Optional[int] = None
+    ):
+        backend = backend or settings.ocr_backend
+        if backend not in OCR_BACKENDS:
+            raise ValueError(f"Unknown OCR backend: {backend}")
+        if backend == "tesserocr" and tesserocr is None:
+            _report_missing_tesserocr()
+            backend = "pytesseract"
+
+        self.backend = backend
+        self.tesseract_cmd = tesseract_cmd or settings.tesseract_path
+        self.tessdata_path = tessdata_path or settings.ocr_tessdata_path
+        self.low_confidence = low_confidence if low_confidence is not None else settings.ocr_low_confidence_threshold
+        self.max_reocr_regions = max_reocr_regions if max_reocr_regions is not None else settings.ocr_reocr_max_regions
+
+    def recognize(self, image: Image.Image) -> OCRPageResult:
+        """OCR a prepared image into text with per-word confidences."""
+        api = _warm_api(self.tessdata_path) if self.backend == "tesserocr" else None
+        if api is None and self.tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = self.tesseract_cmd
+
+        lines = _data_lines(self._image_to_data(api, image))
+        started = time.perf_counter()
+        regions, improved = self._reread_low_confidence(api, image, lines)
+        reocr_ms = (time.perf_counter() - started) * 1000
+
+        text, words = self._assemble(lines)
+        return OCRPageResult(text, words, regions, improved, reocr_ms, "tesserocr" if api is not None else "pytesseract")
+
+    def _image_to_data(self, api, image: Image.Image, psm: Optional[int] = None) -> Dict[str, list]:
+        """Word rows for an image, from the warm API when there is one, else from a new tesseract process."""
+        if api is None:
+            config = f"--psm {psm}" if psm is not None else ""
+            return pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+
+        api.SetPageSegMode(psm if psm is not None else tesserocr.PSM.AUTO)
+        api.SetImage(image)
+        try:
+            return _tsv_to_data(api.GetTSVText(0))
+        finally:
+            # Drop the image and results; the language data stays loaded
+            api.Clear()
+
+    def _reread_low_confidence(self, api, image: Image.Image, lines: List[dict]) -> Tuple[int, int]:
+        """Re-OCR the least confident lines from an enlarged crop, keeping whichever reading scores higher."""
+        unsure = [line for line in lines if _mean_confidence(line["words"]) < self.low_confidence]
+        unsure.sort(key=lambda line: _mean_confidence(line["words"]))
+
+        improved = 0
+        for line in unsure[:self.max_reocr_regions]:
+            left, top, right, bottom = line["box"]
+            pad = (bottom - top) * 0.25
+            box = (
+                max(0, round(left - pad)), max(0, round(top - pad)),
+                min(image.width, round(right + pad)), min(image.height, round(bottom + pad))
+            )
+            crop = image.crop(box)
+            scale = min(REOCR_MAX_SCALE, REOCR_LINE_HEIGHT / max(1, bottom - top))
+            if scale > 1:
+                crop = crop.resize((round(crop.width * scale), round(crop.height * scale)), Image.LANCZOS)
+            data = self._image_to_data(api, crop, REOCR_PSM)
+
+            words = [word for reread in _data_lines(data) for word in reread["words"]]
+            if words and _mean_confidence(words) > _mean_confidence(line["words"]):
+                line["words"] = words
+                improved += 1
+        return min(len(unsure), self.max_reocr_regions), improved
+
+    def _assemble(self, lines: List[dict]) -> Tuple[str, List[OCRWord]]:
+        """Page text laid out like Tesseract's plain output, with each word's offsets in it."""
+        parts: List[str] = []
+        words: List[OCRWord] = []
+        position = 0
+        previous = None
+        for line in lines:
+            paragraph = line["key"][:2]
+            if previous is not None:
+                separator = "\n\n" if paragraph != previous else "\n"
+                parts.append(separator)
+                position += len(separator)
+            previous = paragraph
+
+            for i, (text, confidence) in enumerate(line["words"]):
+                if i:
+                    parts.append(" ")
+                    position += 1
+                words.append(OCRWord(position, position + len(text), confidence))
+                parts.append(text)
+                position += len(text)
+        return "".join(parts), words
+
+def join_pages(pages: List[OCRPageResult]) -> OCRPageResult:
+    """One result for several pages, with the text joined by newlines and word offsets shifted to match."""
+    texts: List[str] = []
+    words: List[OCRWord] = []
+    position = 0
+    for page in pages:
+        texts.append(page.text)
+        words.extend(OCRWord(word.start + position, word.end + position, word.confidence) for word in page.words)
+        position += len(page.text) + 1
+    return OCRPageResult(
+        "\n".join(texts),
+        words,
+        sum(page.reocr_regions for page in pages),
+        sum(page.reocr_improved for page in pages),
+        sum(page.reocr_ms for page in pages),
+        pages[0].backend if pages else "",
+    )
+
+def span_confidence(words: List[OCRWord], span: Tuple[int, int]) -> Optional[float]:
+    """Mean confidence of the words overlapping a span of the page text."""
+    start, end = span
+    confidences = [word.confidence for word in words if word.start < end and word.end > start]
+    if not confidences:
+        return None
+    return round(sum(confidences) / len(confidences), 1)
+
+def confidence_label(score: Optional[float]) -> str:
+    if score is None:
+        return "low"
+    if score >= settings.ocr_high_confidence_threshold:
+        return "high"
+    if score >= settings.ocr_low_confidence_threshold:
+        return "medium"
+    return "low"
+
+class ConfidenceStats:
+    """Running word confidence, second-pass and backend counts reported by OCR workers."""
+
+    def __init__(self):
+        self.pages = 0
+        self.words = 0
+        self.confidence_total = 0.0
+        self.reocr_regions = 0
+        self.reocr_improved = 0
+        self.pages_reread = 0
+        self.reocr_ms = 0.0
+        self.backends: Dict[str, int] = {}
+
+    def record(self, page: OCRPageResult):
+        self.pages += 1
+        self.words += len(page.words)
+        self.confidence_total += sum(word.confidence for word in page.words)
+        self.reocr_regions += page.reocr_regions
+        self.reocr_improved += page.reocr_improved
+        self.pages_reread += page.reocr_regions > 0
+        self.reocr_ms += page.reocr_ms
+        self.backends[page.backend] = self.backends.get(page.backend, 0) + 1
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "pages": self.pages,
+            "pages_by_backend": dict(self.backends),
+            "mean_word_confidence": round(self.confidence_total / self.words, 1) if self.words else None,
+            "pages_reread": self.pages_reread,
+            "reocr_regions": self.reocr_regions,
+            "reocr_improved": self.reocr_improved,
+            "reocr_avg_ms": round(self.reocr_ms / self.pages_reread, 2) if self.pages_reread else 0.0,
+        }
+
+confidence_stats = ConfidenceStats()
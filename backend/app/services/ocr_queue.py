@@ -0,0 +1,189 @@
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models.receipt import Receipt, OCRStatus
+from app.services.ocr_service import OCRService, OCRPoolSaturated
+from app.services.ocr_result_cache import apply_extracted_data, ocr_result_cache
+from app.services.thumbnails import thumbnail_service
+
+class OCRJobQueue:
+    """OCR jobs stored on receipt rows, shared by every API node using the database."""
+
+    def __init__(self, worker_id: Optional[str] = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease = timedelta(seconds=settings.ocr_job_lease_seconds)
+        self.max_attempts = settings.ocr_job_max_attempts
+
+    def claim_next(self, db: Session) -> Optional[Receipt]:
+        """Lock the oldest queued job, or one whose lease expired because its worker died mid-job.
+
+        Jobs whose worker died on every attempt are failed rather than handed out again.
+        """
+        now = datetime.now(timezone.utc)
+        expired = and_(
+            Receipt.ocr_status == OCRStatus.PROCESSING,
+            Receipt.ocr_locked_at < now - self.lease
+        )
+        db.query(Receipt).filter(expired, Receipt.ocr_attempts >= self.max_attempts).update({
+            Receipt.ocr_status: OCRStatus.FAILED,
+            Receipt.ocr_error: "OCR worker stopped before finishing",
+            Receipt.ocr_locked_by: None,
+            Receipt.processed_at: now,
+        }, synchronize_session=False)
+
+        receipt = db.query(Receipt).filter(
+            or_(
+                Receipt.ocr_status == OCRStatus.QUEUED,
+                and_(expired, Receipt.ocr_attempts < self.max_attempts)
+            )
+        ).order_by(Receipt.id).with_for_update(skip_locked=True).first()
+
+        if receipt is None:
+            db.commit()
+            return None
+
+        receipt.ocr_status = OCRStatus.PROCESSING
+        receipt.ocr_locked_by = self.worker_id
+        receipt.ocr_locked_at = now
+        receipt.ocr_attempts += 1
+        db.commit()
+        return receipt
+
+    def _claimed(self, db: Session, receipt_id: int, attempt: int) -> Optional[Receipt]:
+        """The job as claimed for `attempt`, or None once its lease went to another claim.
+
+        The attempt number tells apart claims by concurrent tasks sharing this worker ID.
+        """
+        receipt = db.query(Receipt).filter(
+            Receipt.id == receipt_id,
+            Receipt.ocr_status == OCRStatus.PROCESSING,
+            Receipt.ocr_locked_by == self.worker_id,
+            Receipt.ocr_attempts == attempt
+        ).with_for_update().first()
+        if receipt is None:
+            db.rollback()
+            print(f"OCR job {receipt_id} was reclaimed after its lease expired; dropping attempt {attempt}")
+        return receipt
+
+    def complete(self, db: Session, receipt_id: int, attempt: int, extracted_data: Dict[str, Any]) -> bool:
+        receipt = self._claimed(db, receipt_id, attempt)
+        if receipt is None:
+            return False
+        apply_extracted_data(receipt, extracted_data)
+        receipt.is_processed = True
+        receipt.ocr_status = OCRStatus.COMPLETED
+        receipt.ocr_error = None
+        receipt.ocr_locked_by = None
+        receipt.processed_at = datetime.now(timezone.utc)
+        db.commit()
+        if receipt.content_hash:
+            ocr_result_cache.store(db, receipt.content_hash, extracted_data)
+        return True
+
+    def fail(self, db: Session, receipt_id: int, attempt: int, error: str) -> bool:
+        """Requeue a failed job, or give up after the maximum number of attempts."""
+        receipt = self._claimed(db, receipt_id, attempt)
+        if receipt is None:
+            return False
+        receipt.ocr_error = error
+        receipt.ocr_locked_by = None
+        if receipt.ocr_attempts >= self.max_attempts:
+            receipt.ocr_status = OCRStatus.FAILED
+            receipt.processed_at = datetime.now(timezone.utc)
+        else:
+            receipt.ocr_status = OCRStatus.QUEUED
+        db.commit()
+        return True
+
+    def release(self, db: Session, receipt_id: int, attempt: int) -> bool:
+        """Put a claimed job back without counting the attempt."""
+        receipt = self._claimed(db, receipt_id, attempt)
+        if receipt is None:
+            return False
+        receipt.ocr_status = OCRStatus.QUEUED
+        receipt.ocr_attempts -= 1
+        receipt.ocr_locked_by = None
+        db.commit()
+        return True
+
+class OCRJobWorker:
+    """Pulls queued receipts from the database and runs them through the OCR pool."""
+
+    def __init__(self, concurrency: Optional[int] = None):
+        self.queue = OCRJobQueue()
+        self.concurrency = concurrency or settings.ocr_worker_concurrency or OCRService().pool.workers
+        self._tasks = []
+        self.processed = 0
+        self.failed = 0
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self):
+        while True:
+            try:
+                worked = await self.process_next()
+            except Exception as e:
+                print(f"OCR worker error: {e}")
+                worked = False
+            if not worked:
+                await asyncio.sleep(settings.ocr_worker_poll_seconds)
+
+    async def process_next(self) -> bool:
+        """Claim and process one job. Returns False when the queue was empty."""
+        claimed = await asyncio.to_thread(self._with_session, self._claim)
+        if claimed is None:
+            return False
+
+        receipt_id, attempt, file_path, content_hash = claimed
+        try:
+            extracted_data = await OCRService().extract_receipt_data(file_path, raise_errors=True)
+        except OCRPoolSaturated:
+            await asyncio.to_thread(self._with_session, self.queue.release, receipt_id, attempt)
+            return False
+        except Exception as e:
+            self.failed += 1
+            await asyncio.to_thread(self._with_session, self.queue.fail, receipt_id, attempt, str(e))
+            return True
+
+        if await asyncio.to_thread(self._with_session, self.queue.complete, receipt_id, attempt, extracted_data):
+            self.processed += 1
+        await thumbnail_service.ensure_quietly(file_path, content_hash)
+        return True
+
+    def _claim(self, db: Session):
+        receipt = self.queue.claim_next(db)
+        if receipt is None:
+            return None
+        return receipt.id, receipt.ocr_attempts, receipt.file_path, receipt.content_hash
+
+    def _with_session(self, fn, *args):
+        db = SessionLocal()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.queue.worker_id,
+            "concurrency": self.concurrency,
+            "running": bool(self._tasks),
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+ocr_worker = OCRJobWorker()
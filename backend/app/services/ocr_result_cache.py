@@ -0,0 +1,76 @@
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.receipt import Receipt, OCRResult
+
+def receipt_extracted_data(receipt: Receipt) -> Dict[str, Any]:
+    """OCR fields stored on a receipt or OCRResult, in the shape OCRService returns them."""
+    return {
+        "text": receipt.ocr_text or "",
+        "confidence": receipt.ocr_confidence or "",
+        "confidence_score": receipt.ocr_confidence_score,
+        "field_confidence": json.loads(receipt.ocr_field_confidence) if receipt.ocr_field_confidence else {},
+        "amount": receipt.extracted_amount or "",
+        "currency": receipt.extracted_currency or "",
+        "date": receipt.extracted_date,
+        "merchant": receipt.extracted_merchant or "",
+        "category": receipt.extracted_category or ""
+    }
+
+def apply_extracted_data(receipt: Receipt, extracted_data: Dict[str, Any]):
+    """Copy OCRService output onto a receipt or OCRResult row."""
+    receipt.ocr_text = extracted_data.get("text", "")
+    receipt.ocr_confidence = extracted_data.get("confidence", "")
+    receipt.ocr_confidence_score = extracted_data.get("confidence_score")
+    receipt.ocr_field_confidence = json.dumps(extracted_data.get("field_confidence") or {})
+    receipt.extracted_amount = extracted_data.get("amount", "")
+    receipt.extracted_currency = extracted_data.get("currency", "")
+    receipt.extracted_date = extracted_data.get("date")
+    receipt.extracted_merchant = extracted_data.get("merchant", "")
+    receipt.extracted_category = extracted_data.get("category", "")
+
+class OCRResultCache:
+    """OCR results shared by every upload of the same image bytes."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, db: Session, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Return cached extraction results for a content hash, counting the hit or miss."""
+        result = db.query(OCRResult).filter(OCRResult.content_hash == content_hash).first()
+        if result is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        result.hit_count += 1
+        result.last_hit_at = datetime.now(timezone.utc)
+        db.commit()
+        return receipt_extracted_data(result)
+
+    def store(self, db: Session, content_hash: str, extracted_data: Dict[str, Any]):
+        """Remember extraction results; results with no text, or with pages missing, are not worth caching."""
+        if not extracted_data.get("text") or extracted_data.get("page_errors"):
+            return
+
+        result = OCRResult(content_hash=content_hash, hit_count=0)
+        apply_extracted_data(result, extracted_data)
+        db.add(result)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another upload of the same image finished first
+            db.rollback()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+ocr_result_cache = OCRResultCache()
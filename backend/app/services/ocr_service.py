@@ -1,42 +1,223 @@
-import pytesseract
+import pypdfium2 as pdfium
 from PIL import Image
-import re
-from datetime import datetime
-from typing import Dict, Any, Optional
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Optional, Tuple
 from app.core.config import settings
+from app.services.image_preprocessing import ImagePreprocessor, preprocess_stats
+from app.services.ocr_engine import (
+    OCRPageResult, TesseractRecognizer, confidence_label, confidence_stats, join_pages, span_confidence
+)
+from app.services.receipt_parser import receipt_parser
+
+# Fields whose confidences make up a receipt's overall score
+SCORED_FIELDS = ("amount", "date", "merchant")
+
+# Stands in for a PDF page that could not be read
+BLANK_PAGE = OCRPageResult("", [], 0, 0, 0.0, "")
+
+class OCRPoolSaturated(Exception):
+    """Raised when the OCR queue is full and the job should be retried later."""
+
+class OCRWorkerError(Exception):
+    """An error raised inside an OCR worker process."""
+
+def _image_to_text(image_path: str, preprocessor: ImagePreprocessor, recognizer: TesseractRecognizer) -> Tuple[OCRPageResult, Dict[str, float]]:
+    """Preprocess an image and run Tesseract on it. Executes inside an OCR worker process.
+
+    Returns the recognized page and the preprocessing step timings in milliseconds.
+    """
+    try:
+        with Image.open(image_path) as image:
+            prepared, timings = preprocessor.process(image)
+            return recognizer.recognize(prepared), timings
+    except Exception as e:
+        # Some pytesseract errors can't be unpickled, which would break the whole pool
+        raise OCRWorkerError(f"{type(e).__name__}: {e}") from None
+
+def _pdf_page_to_text(pdf_path: str, page_index: int, dpi: int, preprocessor: ImagePreprocessor, recognizer: TesseractRecognizer) -> Tuple[OCRPageResult, Dict[str, float]]:
+    """Rasterize one PDF page and OCR it. Executes inside an OCR worker process.
+
+    Only this page is rendered, so a worker holds at most one page bitmap at a time.
+    """
+    try:
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            page = pdf[page_index]
+            image = page.render(scale=dpi / 72, grayscale=True).to_pil()
+            page.close()
+        finally:
+            pdf.close()
+        image.info["dpi"] = (dpi, dpi)
+        prepared, timings = preprocessor.process(image)
+        return recognizer.recognize(prepared), timings
+    except Exception as e:
+        raise OCRWorkerError(f"{type(e).__name__}: {e}") from None
+
+def is_pdf(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(5) == b"%PDF-"
+
+def pdf_page_count(path: str) -> int:
+    """Number of pages in a PDF; reads the page tree without rendering anything."""
+    pdf = pdfium.PdfDocument(path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+class OCRWorkerPool:
+    """Bounded process pool that keeps Tesseract off the event loop."""
+
+    def __init__(self, workers: Optional[int] = None, max_queue: Optional[int] = None, max_tasks_per_child: Optional[int] = None):
+        self.workers = workers or settings.ocr_pool_size or os.cpu_count() or 1
+        self.max_queue = max_queue or settings.ocr_max_queue
+        # Workers keep Tesseract loaded between jobs; replacing them now and then caps any leaks
+        self.max_tasks_per_child = max_tasks_per_child or settings.ocr_worker_max_tasks
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        if self._executor is None:
+            # Spawned workers don't inherit the server's sockets, threads or DB connections
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=self.max_tasks_per_child
+            )
+
+    async def shutdown(self):
+        """Stop the workers, waiting in a thread so the event loop keeps serving meanwhile."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+    async def run(self, fn, *args):
+        """Run `fn(*args)` in a worker process, rejecting work once the queue is full.
+
+        A job counts as pending until a worker is done with it, even when the caller
+        stopped waiting because it was cancelled.
+        """
+        if self.pending >= self.max_queue:
+            self.rejected += 1
+            raise OCRPoolSaturated(f"OCR queue is full ({self.pending} jobs pending)")
+
+        self.start()
+        executor = self._executor
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        job = None
+        try:
+            job = executor.submit(fn, *args)
+            job.add_done_callback(lambda _: self._job_done(loop))
+            result = await asyncio.wrap_future(job)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); replace the pool for the next job
+            self.failed += 1
+            if self._executor is executor:
+                self._executor = None
+                # Stops the broken pool's management thread and any workers still alive
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            if job is None:
+                self.pending -= 1
+        self.completed += 1
+        return result
+
+    def _job_done(self, loop: asyncio.AbstractEventLoop):
+        """Called from the executor's thread once a worker finished, or a queued job was cancelled."""
+        def done():
+            self.pending -= 1
+        try:
+            loop.call_soon_threadsafe(done)
+        except RuntimeError:
+            # The event loop already closed; nothing is left to count for
+            pass
+
+    def worker_pids(self) -> List[int]:
+        """Process IDs of the workers currently running; empty before the first job."""
+        executor = self._executor
+        if executor is None:
+            return []
+        # The executor only tracks its processes privately; this is the one place that reads them
+        return list(executor._processes or {})
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_tasks_per_child": self.max_tasks_per_child,
+            "pending": self.pending,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+ocr_pool = OCRWorkerPool()
 
 class OCRService:
-    def __init__(self):
-        if settings.tesseract_path:
-            pytesseract.pytesseract.tesseract_cmd = settings.tesseract_path
+    def __init__(
+        self,
+        pool: Optional[OCRWorkerPool] = None,
+        preprocessor: Optional[ImagePreprocessor] = None,
+        recognizer: Optional[TesseractRecognizer] = None
+    ):
+        self.pool = pool or ocr_pool
+        self.preprocessor = preprocessor or ImagePreprocessor()
+        self.recognizer = recognizer or TesseractRecognizer()
     
-    async def extract_receipt_data(self, image_path: str) -> Dict[str, Any]:
-        """Extract data from receipt image using OCR."""
+    async def extract_receipt_data(self, image_path: str, raise_errors: bool = False) -> Dict[str, Any]:
+        """Extract data from receipt image using OCR.
+
+        Failures return an empty low-confidence result unless `raise_errors` is set.
+        """
         try:
-            # Open and process image
-            image = Image.open(image_path)
+            page_errors = {}
+            if await asyncio.to_thread(is_pdf, image_path):
+                page, fields, spans, page_errors = await self._extract_pdf(image_path)
+            else:
+                # Extract text using OCR in a worker process
+                page, timings = await self.pool.run(_image_to_text, image_path, self.preprocessor, self.recognizer)
+                preprocess_stats.record(timings)
+                confidence_stats.record(page)
+                fields, spans = receipt_parser.parse_with_spans(page.text)
             
-            # Extract text using OCR
-            text = pytesseract.image_to_string(image)
+            field_confidence, score = self._score(page, spans)
             
             # Extract structured data
             extracted_data = {
-                "text": text,
-                "confidence": "high",  # Could be calculated from OCR confidence
-                "amount": self._extract_amount(text),
-                "currency": self._extract_currency(text),
-                "date": self._extract_date(text),
-                "merchant": self._extract_merchant(text),
-                "category": self._extract_category(text)
+                "text": page.text,
+                "confidence": confidence_label(score),
+                "confidence_score": score,
+                "field_confidence": field_confidence,
+                "page_errors": page_errors,
+                **fields
             }
             
             return extracted_data
             
+        except OCRPoolSaturated:
+            raise
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"OCR processing error: {e}")
             return {
                 "text": "",
                 "confidence": "low",
+                "confidence_score": None,
+                "field_confidence": {},
+                "page_errors": {},
                 "amount": "",
                 "currency": "",
                 "date": None,
@@ -44,105 +225,85 @@ class OCRService:
                 "category": ""
             }
     
-    def _extract_amount(self, text: str) -> str:
-        """Extract amount from OCR text."""
-        # Look for currency patterns
-        amount_patterns = [
-            r'\$(\d+\.?\d*)',  # $123.45
-            r'(\d+\.?\d*)\s*\$',  # 123.45 $
-            r'(\d+\.?\d*)\s*(?:USD|EUR|GBP|INR)',  # 123.45 USD
-            r'Total[:\s]*(\d+\.?\d*)',  # Total: 123.45
-            r'Amount[:\s]*(\d+\.?\d*)',  # Amount: 123.45
-        ]
-        
-        for pattern in amount_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return match.group(1)
-        
-        return ""
-    
-    def _extract_currency(self, text: str) -> str:
-        """Extract currency from OCR text."""
-        currency_patterns = [
-            r'\$',  # Dollar sign
-            r'USD',  # USD
-            r'EUR',  # EUR
-            r'GBP',  # GBP
-            r'INR',  # INR
-        ]
-        
-        for pattern in currency_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                if pattern == r'\$':
-                    return "USD"
-                return pattern
-        
-        return "USD"  # Default to USD
-    
-    def _extract_date(self, text: str) -> Optional[datetime]:
-        """Extract date from OCR text."""
-        date_patterns = [
-            r'(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})',  # MM/DD/YYYY or DD/MM/YYYY
-            r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})',  # YYYY/MM/DD
-            r'(\d{1,2})\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+(\d{2,4})',  # DD Mon YYYY
-        ]
-        
-        for pattern in date_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                try:
-                    if len(match.groups()) == 3:
-                        # Try different date formats
-                        for fmt in ['%m/%d/%Y', '%d/%m/%Y', '%Y/%m/%d', '%d %b %Y']:
-                            try:
-                                date_str = '/'.join(match.groups())
-                                return datetime.strptime(date_str, fmt)
-                            except:
-                                continue
-                except:
-                    continue
+    def _score(self, page: OCRPageResult, spans: Dict[str, Tuple[int, int]]) -> Tuple[Dict[str, float], Optional[float]]:
+        """Per-field confidence from the words each field was read from, and an overall score.
+
+        The overall score averages the key fields that were found, falling back to every
+        word on the page when none were.
+        """
+        field_confidence = {}
+        for field, span in spans.items():
+            confidence = span_confidence(page.words, span)
+            if confidence is not None:
+                field_confidence[field] = confidence
         
-        return None
+        scored = [field_confidence[field] for field in SCORED_FIELDS if field in field_confidence]
+        if not scored:
+            scored = [word.confidence for word in page.words]
+        score = round(sum(scored) / len(scored), 1) if scored else None
+        return field_confidence, score
     
-    def _extract_merchant(self, text: str) -> str:
-        """Extract merchant name from OCR text."""
-        # Look for common merchant indicators
-        merchant_indicators = [
-            r'Merchant[:\s]*([^\n]+)',
-            r'Store[:\s]*([^\n]+)',
-            r'Business[:\s]*([^\n]+)',
-        ]
-        
-        for pattern in merchant_indicators:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
-        
-        # If no specific pattern, take first line as merchant
-        lines = text.split('\n')
-        if lines:
-            return lines[0].strip()
+    async def _extract_pdf(self, pdf_path: str) -> Tuple[OCRPageResult, Dict[str, Any], Dict[str, Tuple[int, int]], Dict[int, str]]:
+        """OCR a PDF's pages in parallel, in page order, stopping once the key fields are found.
+
+        At most one page per pool worker is in flight, so pages are rendered as they are
+        needed rather than all up front. Pages that fail are read as blank and reported in
+        the returned errors, keyed by page number; the document only fails when every page
+        that was tried did. A full pool raises OCRPoolSaturated, so the job can be queued.
+        """
+        # pdfium opens the file, so count the pages in a worker too
+        page_count = min(await self.pool.run(pdf_page_count, pdf_path), settings.ocr_pdf_max_pages)
+        pages: Dict[int, OCRPageResult] = {}
+        errors: Dict[int, BaseException] = {}
+        running: Dict[asyncio.Future, int] = {}
+        next_page = 0
+        leading_pages = 0
+        found_fields = set()
         
-        return ""
-    
-    def _extract_category(self, text: str) -> str:
-        """Extract expense category from OCR text."""
-        # Look for common expense categories
-        category_keywords = {
-            'food': ['restaurant', 'food', 'dining', 'cafe', 'coffee'],
-            'travel': ['hotel', 'flight', 'taxi', 'uber', 'lyft', 'travel'],
-            'office': ['office', 'supplies', 'stationery', 'equipment'],
-            'transport': ['gas', 'fuel', 'parking', 'toll', 'transport'],
-            'entertainment': ['movie', 'theater', 'entertainment', 'sports'],
-            'utilities': ['electricity', 'water', 'internet', 'phone', 'utility']
-        }
+        try:
+            while next_page < page_count or running:
+                while next_page < page_count and len(running) < self.pool.workers:
+                    task = asyncio.ensure_future(self.pool.run(
+                        _pdf_page_to_text, pdf_path, next_page, settings.ocr_pdf_dpi,
+                        self.preprocessor, self.recognizer
+                    ))
+                    running[task] = next_page
+                    next_page += 1
+                
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    page_index = running.pop(task)
+                    if task.exception() is not None:
+                        errors[page_index] = task.exception()
+                        pages[page_index] = BLANK_PAGE
+                        continue
+                    pages[page_index], timings = task.result()
+                    preprocess_stats.record(timings)
+                    confidence_stats.record(pages[page_index])
+                for error in errors.values():
+                    if isinstance(error, OCRPoolSaturated):
+                        # Retried later as a whole, like any other job turned away
+                        raise error
+                
+                # Only trust fields from an unbroken run of pages from the start. Each page
+                # is parsed once as it joins the run: a field found on one of its pages is
+                # found in the whole run, which is all stopping needs
+                while leading_pages in pages:
+                    page_fields = receipt_parser.parse(pages[leading_pages].text)
+                    found_fields.update(field for field in SCORED_FIELDS if page_fields[field])
+                    leading_pages += 1
+                if len(found_fields) == len(SCORED_FIELDS):
+                    break
+        finally:
+            for task in running:
+                task.cancel()
         
-        text_lower = text.lower()
-        for category, keywords in category_keywords.items():
-            for keyword in keywords:
-                if keyword in text_lower:
-                    return category.title()
+        if errors and len(errors) == len(pages):
+            raise errors[min(errors)]
+        page_errors = {page_index + 1: str(error) for page_index, error in sorted(errors.items())}
+        for page_number, error in page_errors.items():
+            print(f"OCR failed on page {page_number} of {pdf_path}: {error}")
         
-        return "Miscellaneous"
-
+        fields, spans = receipt_parser.parse_with_spans(join_pages([pages[i] for i in range(leading_pages)]).text)
+        # Pages after the leading run only add text, so the spans stay valid
+        return join_pages([pages[i] for i in sorted(pages)]), fields, spans, page_errors
@@ -0,0 +1,135 @@
+import asyncio
+from datetime import date, timedelta
+from typing import Callable, Dict, Optional, TypeVar
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models.exchange_rate import ExchangeRate
+from app.services.currency_provider import get_currency_provider
+
+# Days requested from the history API per call
+BACKFILL_CHUNK_DAYS = 90
+
+T = TypeVar("T")
+
+def _in_session(work: Callable[..., T], *args) -> T:
+    """Run `work(db, *args)` in a short session of its own; called from a worker thread."""
+    db = SessionLocal()
+    try:
+        return work(db, *args)
+    finally:
+        db.close()
+
+class RateHistoryService:
+    """Daily exchange rates stored locally, so conversions don't need the network."""
+
+    def __init__(self, provider=None):
+        self.provider = provider or get_currency_provider()
+        self.base_currency = settings.currency_base_currency
+
+    def get_rate(self, db: Session, on_date: date, from_currency: str, to_currency: str) -> Optional[float]:
+        """Rate published on the latest day on or before `on_date`, or None if not stored."""
+        if from_currency == to_currency:
+            return 1.0
+
+        latest_day = db.query(func.max(ExchangeRate.rate_date)).filter(
+            ExchangeRate.base_currency == self.base_currency,
+            ExchangeRate.rate_date <= on_date
+        ).scalar_subquery()
+
+        quotes = dict(db.query(ExchangeRate.quote_currency, ExchangeRate.rate).filter(
+            ExchangeRate.base_currency == self.base_currency,
+            ExchangeRate.rate_date == latest_day,
+            ExchangeRate.quote_currency.in_([from_currency, to_currency])
+        ).all())
+
+        if from_currency not in quotes or to_currency not in quotes:
+            return None
+        return quotes[to_currency] / quotes[from_currency]
+
+    def latest_date(self, db: Session) -> Optional[date]:
+        return db.query(func.max(ExchangeRate.rate_date)).filter(
+            ExchangeRate.base_currency == self.base_currency
+        ).scalar()
+
+    def store_rates(self, db: Session, tables: Dict[date, Dict[str, float]]) -> int:
+        """Insert daily rate tables, skipping (date, quote) pairs already stored."""
+        if not tables:
+            return 0
+
+        existing = set(db.query(ExchangeRate.rate_date, ExchangeRate.quote_currency).filter(
+            ExchangeRate.base_currency == self.base_currency,
+            ExchangeRate.rate_date.between(min(tables), max(tables))
+        ).all())
+
+        rows = [
+            {
+                "rate_date": rate_date,
+                "base_currency": self.base_currency,
+                "quote_currency": quote_currency,
+                "rate": rate
+            }
+            for rate_date, rates in tables.items()
+            for quote_currency, rate in rates.items()
+            if rate and (rate_date, quote_currency) not in existing
+        ]
+        if rows:
+            db.execute(insert(ExchangeRate), rows)
+        db.commit()
+        return len(rows)
+
+    async def backfill(self, start: date, end: date) -> int:
+        """Download and store daily rates for a date range.
+
+        Each chunk is stored in a worker thread, so a long backfill doesn't block the event loop.
+        """
+        stored = 0
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(chunk_start + timedelta(days=BACKFILL_CHUNK_DAYS - 1), end)
+            tables = await self.provider.fetch_history(self.base_currency, chunk_start, chunk_end)
+            stored += await asyncio.to_thread(_in_session, self.store_rates, tables)
+            chunk_start = chunk_end + timedelta(days=1)
+        return stored
+
+    async def update(self) -> int:
+        """Fetch days published since the last stored one, backfilling an empty table."""
+        today = date.today()
+        latest = await asyncio.to_thread(_in_session, self.latest_date)
+        if latest is None:
+            start = today - timedelta(days=settings.currency_history_backfill_days)
+        else:
+            start = latest + timedelta(days=1)
+        if start > today:
+            return 0
+        return await self.backfill(start, today)
+
+_updater_task: Optional[asyncio.Task] = None
+
+async def _update_loop():
+    """Keep the stored rate history current."""
+    service = RateHistoryService()
+    while True:
+        try:
+            await service.update()
+        except Exception as e:
+            print(f"Currency history update error: {e}")
+        await asyncio.sleep(settings.currency_history_update_interval_seconds)
+
+def start_history_updater():
+    """Start the background history updater on the running event loop."""
+    global _updater_task
+    if _updater_task is None or _updater_task.done():
+        _updater_task = asyncio.create_task(_update_loop())
+
+async def stop_history_updater():
+    """Cancel the background history updater."""
+    global _updater_task
+    if _updater_task is not None:
+        _updater_task.cancel()
+        try:
+            await _updater_task
+        except asyncio.CancelledError:
+            pass
+        _updater_task = None
@@ -0,0 +1,255 @@
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# A number as printed on receipts: 12, 12.50 or 1,234.56
+_NUMBER = r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?"
+
+_SYMBOL_CURRENCIES = {"$": "USD", "€": "EUR", "£": "GBP", "₹": "INR"}
+_CODE_CURRENCIES = {"usd": "USD", "eur": "EUR", "gbp": "GBP", "inr": "INR"}
+
+_MONTHS = {name: number for number, name in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1
+)}
+
+# Checked in order; the first category with a keyword in the text wins
+CATEGORY_KEYWORDS = {
+    "Food": ["restaurant", "food", "dining", "cafe", "coffee"],
+    "Travel": ["hotel", "flight", "taxi", "uber", "lyft", "travel"],
+    "Office": ["office", "supplies", "stationery", "equipment"],
+    "Transport": ["gas", "fuel", "parking", "toll", "transport"],
+    "Entertainment": ["movie", "theater", "entertainment", "sports"],
+    "Utilities": ["electricity", "water", "internet", "phone", "utility"],
+}
+
+_MERCHANT_LABELS = ("merchant", "store", "business")
+
+# Digits starting a number, rather than continuing one
+_LEAD = r"(?P<lead>[0-9](?<![0-9.,][0-9])[0-9]*)(?![0-9])"
+
+# The same, but not the day or year at the end of a date
+_AMOUNT_LEAD = r"(?P<lead>[0-9](?<![0-9.,][0-9])(?<![0-9][/-][0-9])[0-9]*)(?![0-9])"
+
+# 01/02/2024, 2024-01-02 or 2 Jan 2024
+_DATE = re.compile(
+    _LEAD + r"(?:"
+    r"[/-](?P<middle>[0-9]{1,2})[/-](?P<last>[0-9]{1,4})\b"
+    r"|\s+(?P<month>jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?,?\s+(?P<year>[0-9]{4}|[0-9]{2})\b"
+    r")"
+)
+
+# $12.50
+_PREFIXED = re.compile(r"(?P<symbol>[$€£₹])\s*(?P<number>" + _NUMBER + r")")
+
+# 12.50 € or 12.50 EUR
+_SUFFIXED = re.compile(
+    _AMOUNT_LEAD + r"(?P<fraction>(?:,[0-9]{3})*(?:\.[0-9]+)?)\s*"
+    r"(?:(?P<symbol>[$€£₹])|(?P<code>usd|eur|gbp|inr)\b)"
+)
+
+# The number after a "Total" or "Amount" label, past any punctuation
+_LABELLED_AMOUNT = re.compile(r"[^a-z0-9$€£₹]*(?P<symbol>[$€£₹])?\s*(?P<number>" + _NUMBER + r")")
+
+# What separates a merchant label from the name
+_LABEL_GAP = re.compile(r"[^a-z0-9$€£₹]*")
+
+_LINES = re.compile(r"[^\n]+")
+
+def _fold(text: str) -> str:
+    """Lower-case text one character for one, so "İ" becomes "i" and offsets still line up."""
+    return "".join(char.lower()[0] for char in text)
+
+def _word_end(lowered: str, position: int, length: int) -> Optional[int]:
+    """Where the word found at `position` ends, past a plural "s" or "es", or None when it
+    is only part of a longer word."""
+    if position and "a" <= lowered[position - 1] <= "z":
+        return None
+    end = position + length
+    for ending in ("es", "s", ""):
+        if lowered.startswith(ending, end):
+            after = end + len(ending)
+            if after == len(lowered) or not "a" <= lowered[after] <= "z":
+                return after
+    return None
+
+def _find_word(lowered: str, word: str, start: int = 0) -> Optional[Tuple[int, int]]:
+    """The first whole-word occurrence of `word` from `start`, as (position, end)."""
+    position = lowered.find(word, start)
+    while position >= 0:
+        end = _word_end(lowered, position, len(word))
+        if end is not None:
+            return position, end
+        position = lowered.find(word, position + 1)
+    return None
+
+def _first_word(lowered: str, words: Iterable[str], start: int = 0) -> Optional[Tuple[str, int, int]]:
+    """Whichever of `words` occurs first as a whole word from `start`, as (word, position, end)."""
+    first = None
+    for word in words:
+        found = _find_word(lowered, word, start)
+        if found is not None and (first is None or found[0] < first[1]):
+            first = (word, *found)
+    return first
+
+def _year(value: str) -> int:
+    year = int(value)
+    return year + 2000 if year < 100 else year
+
+def _make_date(year: int, month: int, day: int) -> Optional[datetime]:
+    try:
+        return datetime(year, month, day)
+    except ValueError:
+        return None
+
+class ReceiptParser:
+    """Extracts amount, currency, date, merchant and category from OCR text.
+
+    Every field is found with `str.find` on a literal or a regex that starts with one
+    character class, so the scans run in C and skip quickly over text that can't match;
+    fields are only looked for as far as the ones before them leave them undecided.
+    """
+
+    def parse(self, text: str) -> Dict[str, Any]:
+        return self.parse_with_spans(text)[0]
+
+    def parse_with_spans(self, text: str) -> Tuple[Dict[str, Any], Dict[str, Tuple[int, int]]]:
+        """Parse the text, also returning where in it each found field was read from."""
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # A few characters (e.g. "İ") grow when lower-cased, which would shift every
+            # offset after them
+            lowered = _fold(text)
+
+        spans = {}
+        amount, amount_currency, amount_span = self._amount(lowered)
+        currency = (
+            amount_currency
+            or self._code_currency(lowered)
+            or self._prefixed_currency(lowered)
+            or self._suffixed_currency(lowered)
+            or "USD"
+        )
+
+        found_date = None
+        for match in _DATE.finditer(lowered):
+            found_date = self._date(match)
+            if found_date is not None:
+                spans["date"] = match.span()
+                break
+
+        merchant, merchant_span = self._merchant(text, lowered)
+
+        category = "Miscellaneous"
+        for name, keywords in CATEGORY_KEYWORDS.items():
+            found = _first_word(lowered, keywords)
+            if found is not None:
+                keyword, position, _ = found
+                category = name
+                spans["category"] = (position, position + len(keyword))
+                break
+
+        for field, span in (("amount", amount_span), ("merchant", merchant_span)):
+            if span is not None:
+                spans[field] = span
+
+        fields = {
+            "amount": amount.replace(",", ""),
+            "currency": currency,
+            "date": found_date,
+            "merchant": merchant,
+            "category": category,
+        }
+        return fields, spans
+
+    def _amount(self, lowered: str) -> Tuple[str, Optional[str], Optional[Tuple[int, int]]]:
+        """The amount paid, its currency when printed with it, and its span.
+
+        The last "Total" wins, since the grand total is printed after subtotals and tips;
+        then the first amount with a currency before or after it; then an "Amount" label.
+        """
+        position = lowered.rfind("total")
+        while position >= 0:
+            end = _word_end(lowered, position, len("total"))
+            match = _LABELLED_AMOUNT.match(lowered, end) if end is not None else None
+            if match is not None:
+                return match.group("number"), _SYMBOL_CURRENCIES.get(match.group("symbol")), match.span("number")
+            position = lowered.rfind("total", 0, position)
+
+        match = _PREFIXED.search(lowered)
+        if match is not None:
+            return match.group("number"), _SYMBOL_CURRENCIES[match.group("symbol")], match.span("number")
+
+        match = _SUFFIXED.search(lowered)
+        if match is not None:
+            return match.group("lead") + match.group("fraction"), self._suffix_currency(match), (match.start("lead"), match.end("fraction"))
+
+        found = _find_word(lowered, "amount")
+        while found is not None:
+            match = _LABELLED_AMOUNT.match(lowered, found[1])
+            if match is not None:
+                return match.group("number"), None, match.span("number")
+            found = _find_word(lowered, "amount", found[0] + 1)
+        return "", None, None
+
+    def _code_currency(self, lowered: str) -> Optional[str]:
+        """The first currency code standing on its own, not printed after an amount."""
+        found = _first_word(lowered, _CODE_CURRENCIES)
+        while found is not None:
+            code, position, _ = found
+            before = position - 1
+            while before >= 0 and lowered[before].isspace():
+                before -= 1
+            after = position + len(code)
+            # As in _SUFFIXED, a code after a number must end a word to belong to it
+            suffix = before >= 0 and lowered[before].isdigit() and not lowered[after:after + 1].isalnum()
+            if not suffix:
+                return _CODE_CURRENCIES[code]
+            found = _first_word(lowered, _CODE_CURRENCIES, position + 1)
+        return None
+
+    def _prefixed_currency(self, lowered: str) -> Optional[str]:
+        match = _PREFIXED.search(lowered)
+        return _SYMBOL_CURRENCIES[match.group("symbol")] if match is not None else None
+
+    def _suffixed_currency(self, lowered: str) -> Optional[str]:
+        match = _SUFFIXED.search(lowered)
+        return self._suffix_currency(match) if match is not None else None
+
+    def _suffix_currency(self, match: re.Match) -> str:
+        symbol = match.group("symbol")
+        return _SYMBOL_CURRENCIES[symbol] if symbol else _CODE_CURRENCIES[match.group("code")]
+
+    def _merchant(self, text: str, lowered: str) -> Tuple[str, Optional[Tuple[int, int]]]:
+        """The name after the first "Merchant", "Store" or "Business" label, or else the
+        first line, since receipts are headed by the merchant's name."""
+        found = _first_word(lowered, _MERCHANT_LABELS)
+        while found is not None:
+            start = _LABEL_GAP.match(lowered, found[2]).end()
+            line_end = text.find("\n", start)
+            if line_end < 0:
+                line_end = len(text)
+            merchant = text[start:line_end].strip(": \t")
+            if merchant:
+                return merchant, (start, line_end)
+            found = _first_word(lowered, _MERCHANT_LABELS, found[1] + 1)
+
+        for line in _LINES.finditer(text):
+            if line.group().strip():
+                return line.group().strip(), line.span()
+        return "", None
+
+    def _date(self, match: re.Match) -> Optional[datetime]:
+        lead = match.group("lead")
+        if match.group("month") is not None:
+            return _make_date(_year(match.group("year")), _MONTHS[match.group("month")], int(lead))
+
+        middle, last = int(match.group("middle")), match.group("last")
+        if len(lead) == 4:
+            return _make_date(int(lead), middle, int(last))
+        if len(lead) <= 2 and len(last) in (2, 4):
+            first, year = int(lead), _year(last)
+            # US order first, day-first when the month can't be right
+            return _make_date(year, first, middle) or _make_date(year, middle, first)
+        return None
+
+receipt_parser = ReceiptParser()
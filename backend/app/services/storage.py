@@ -0,0 +1,214 @@
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, Optional
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.receipt import Receipt
+from app.services.thumbnails import thumbnail_path
+
+class BlobStorage(ABC):
+    """Receipt files stored once per distinct content, under their SHA-256.
+
+    Uploads are streamed into `staging_directory()` and handed to `put`, which makes
+    them visible under their hash in one atomic step. Blobs are never modified; a blob
+    is referenced by every Receipt row with its hash and is removed by `collect_garbage`
+    once none are left.
+
+    An object-store backend keeps the same interface: `put` uploads the staged file,
+    and `local_path` downloads to a local cache, since Tesseract, pdfium and sendfile
+    all need a file on disk.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def staging_directory(self) -> str:
+        ...
+
+    @abstractmethod
+    def put(self, staged_path: str, content_hash: str) -> str:
+        """Store a complete staged file under its hash, consuming it. Returns the blob's local path."""
+
+    @abstractmethod
+    def local_path(self, content_hash: str) -> str:
+        ...
+
+    @abstractmethod
+    def exists(self, content_hash: str) -> bool:
+        ...
+
+    @abstractmethod
+    def last_stored(self, content_hash: str) -> float:
+        """When the blob was last stored or deduplicated against, as a Unix timestamp."""
+
+    @abstractmethod
+    def delete_unused(self, content_hash: str, older_than: float, is_referenced: Callable[[str], bool]) -> bool:
+        """Delete a blob last stored before `older_than` that `is_referenced` says nothing uses.
+
+        Both are checked once a concurrent `put` can no longer keep the blob alive, so a
+        blob stored or referenced meanwhile survives. Returns whether it was deleted.
+        """
+
+    @abstractmethod
+    def hashes(self) -> Iterator[str]:
+        """Every stored blob's content hash."""
+
+    @abstractmethod
+    def remove_stale_staged(self, older_than: float) -> int:
+        """Delete uploads left in staging by crashed requests, returning how many."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        ...
+
+class LocalBlobStorage(BlobStorage):
+    """Blobs in a directory tree fanned out by hash prefix, e.g. ab/cd/abcd1234...
+
+    Two levels of 256 directories keep each directory small well past millions of blobs.
+    """
+
+    name = "local"
+
+    def __init__(self, root: Optional[str] = None, fanout_levels: Optional[int] = None):
+        self.root = root or settings.storage_directory or os.path.join(settings.upload_directory, "blobs")
+        self.fanout_levels = fanout_levels if fanout_levels is not None else settings.storage_fanout_levels
+        self.stored = 0
+        self.deduplicated = 0
+
+    def staging_directory(self) -> str:
+        # Inside the root, so renaming a staged file into place never crosses filesystems
+        directory = os.path.join(self.root, ".staging")
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def local_path(self, content_hash: str) -> str:
+        shards = [content_hash[2 * level:2 * level + 2] for level in range(self.fanout_levels)]
+        return os.path.join(self.root, *shards, content_hash)
+
+    def put(self, staged_path: str, content_hash: str) -> str:
+        path = self.local_path(content_hash)
+        try:
+            # Same bytes may be stored already; bump the mtime so garbage collection's grace
+            # period covers the receipt about to reference it
+            os.utime(path)
+        except FileNotFoundError:
+            # Not stored, or garbage collection just took it: store this copy
+            pass
+        else:
+            os.unlink(staged_path)
+            self.deduplicated += 1
+            return path
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(staged_path, path)
+        self.stored += 1
+        return path
+
+    def exists(self, content_hash: str) -> bool:
+        return os.path.exists(self.local_path(content_hash))
+
+    def last_stored(self, content_hash: str) -> float:
+        return os.stat(self.local_path(content_hash)).st_mtime
+
+    def delete_unused(self, content_hash: str, older_than: float, is_referenced: Callable[[str], bool]) -> bool:
+        path = self.local_path(content_hash)
+        # Moved out of place first, so a concurrent put stores a fresh copy rather than
+        # bumping the mtime of one about to be unlinked
+        doomed = os.path.join(self.staging_directory(), f"{content_hash}.deleting")
+        try:
+            os.replace(path, doomed)
+        except FileNotFoundError:
+            return False
+
+        keep = True
+        try:
+            keep = os.stat(doomed).st_mtime > older_than or is_referenced(content_hash)
+        finally:
+            if keep:
+                os.replace(doomed, path)
+        if keep:
+            return False
+        os.unlink(doomed)
+        return True
+
+    def hashes(self) -> Iterator[str]:
+        for _, subdirectories, filenames in os.walk(self.root):
+            # Skip the staging directory
+            subdirectories[:] = [name for name in subdirectories if not name.startswith(".")]
+            yield from (name for name in filenames if not name.startswith("."))
+
+    def remove_stale_staged(self, older_than: float) -> int:
+        removed = 0
+        with os.scandir(self.staging_directory()) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < older_than:
+                    os.unlink(entry.path)
+                    removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+        }
+
+_storage = None
+
+def get_storage() -> BlobStorage:
+    """Return the process-wide receipt storage selected in settings."""
+    global _storage
+    if _storage is None:
+        if settings.storage_backend != "local":
+            raise ValueError(f"Unknown storage backend: {settings.storage_backend}")
+        _storage = LocalBlobStorage()
+    return _storage
+
+def reference_count(db: Session, content_hash: str) -> int:
+    """Receipts pointing at a blob."""
+    return db.query(Receipt).filter(Receipt.content_hash == content_hash).count()
+
+def collect_garbage(db: Session, storage: Optional[BlobStorage] = None, grace_seconds: Optional[int] = None, dry_run: bool = False) -> Dict[str, int]:
+    """Delete blobs no receipt references, along with their thumbnails.
+
+    Blobs stored within the grace period are kept: their receipt may not be committed
+    yet, and OCR-only uploads reference nothing but are still being read.
+    """
+    storage = storage or get_storage()
+    grace_seconds = grace_seconds if grace_seconds is not None else settings.storage_gc_grace_seconds
+    cutoff = time.time() - grace_seconds
+    referenced = {content_hash for (content_hash,) in db.query(Receipt.content_hash).filter(Receipt.content_hash.isnot(None)).distinct()}
+
+    result = {"scanned": 0, "referenced": 0, "recent": 0, "deleted": 0, "stale_staged": 0}
+    for content_hash in storage.hashes():
+        result["scanned"] += 1
+        if content_hash in referenced:
+            result["referenced"] += 1
+            continue
+        if storage.last_stored(content_hash) > cutoff:
+            result["recent"] += 1
+            continue
+        # A receipt may have been committed since the scan started
+        if reference_count(db, content_hash):
+            result["referenced"] += 1
+            continue
+
+        if dry_run:
+            result["deleted"] += 1
+            continue
+        if not storage.delete_unused(content_hash, cutoff, lambda content_hash: reference_count(db, content_hash) > 0):
+            # Stored again or referenced while it was being collected
+            result["referenced"] += 1
+            continue
+        result["deleted"] += 1
+        for size in settings.receipt_thumbnail_sizes:
+            for image_format in settings.receipt_thumbnail_formats:
+                try:
+                    os.unlink(thumbnail_path(content_hash, size, image_format))
+                except FileNotFoundError:
+                    pass
+
+    if not dry_run:
+        result["stale_staged"] = storage.remove_stale_staged(cutoff)
+    return result
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import pypdfium2 as pdfium
+from PIL import Image, ImageOps
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.services.ocr_service import OCRWorkerPool, OCRWorkerError, is_pdf, ocr_pool
+
+THUMBNAIL_MEDIA_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+# Receipts are long and narrow; thumbnails are `size` wide and at most this many times as tall
+MAX_ASPECT = 3
+
+def thumbnail_path(content_hash: str, size: int, image_format: str, directory: Optional[str] = None) -> str:
+    """Where the thumbnail of an image with this content hash lives.
+
+    Thumbnails are keyed by the original's content, so uploads of the same image share them
+    and a path's bytes never change.
+    """
+    directory = directory or os.path.join(settings.upload_directory, "thumbnails")
+    return os.path.join(directory, content_hash[:2], f"{content_hash}-{size}.{image_format}")
+
+def _open_source(path: str, width: int) -> Image.Image:
+    """The original at a resolution big enough for a `width`-wide thumbnail; PDFs show their first page."""
+    if is_pdf(path):
+        pdf = pdfium.PdfDocument(path)
+        try:
+            page = pdf[0]
+            scale = width / page.get_width()
+            image = page.render(scale=max(scale, 0.1)).to_pil()
+            page.close()
+        finally:
+            pdf.close()
+        return image
+
+    image = Image.open(path)
+    # JPEGs decode straight at 1/2, 1/4 or 1/8 scale when that is still big enough
+    image.draft("RGB", (width, width))
+    return ImageOps.exif_transpose(image)
+
+def _save_atomic(image: Image.Image, path: str, image_format: str, quality: int):
+    """Write the thumbnail under a temporary name and rename it, so it is never served half-written."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".thumb-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if image_format == "jpeg":
+                image.save(f, "JPEG", quality=quality, optimize=True, progressive=True)
+            else:
+                image.save(f, "WEBP", quality=quality, method=4)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+def render_thumbnails(source_path: str, content_hash: str, sizes: List[int], formats: List[str], quality: int, directory: Optional[str] = None) -> int:
+    """Render every thumbnail size and format of an upload. Executes inside an OCR worker process.
+
+    Sizes are produced largest first, each reduced from the one before. Returns the number
+    of files written.
+    """
+    try:
+        image = _open_source(source_path, max(sizes))
+        image = image.convert("RGB")
+        written = 0
+        for size in sorted(sizes, reverse=True):
+            image.thumbnail((size, size * MAX_ASPECT), Image.LANCZOS, reducing_gap=3.0)
+            for image_format in formats:
+                _save_atomic(image, thumbnail_path(content_hash, size, image_format, directory), image_format, quality)
+                written += 1
+        return written
+    except Exception as e:
+        raise OCRWorkerError(f"{type(e).__name__}: {e}") from None
+
+class ThumbnailService:
+    """Generates receipt thumbnails in the OCR worker pool and counts how they are served."""
+
+    def __init__(self, pool: Optional[OCRWorkerPool] = None):
+        self.pool = pool or ocr_pool
+        self.sizes = sorted(settings.receipt_thumbnail_sizes)
+        self.formats = list(settings.receipt_thumbnail_formats)
+        self.generated = 0
+        self.generated_on_request = 0
+        self.served = 0
+        self.not_modified = 0
+
+    def missing(self, content_hash: str) -> bool:
+        return any(
+            not os.path.exists(thumbnail_path(content_hash, size, image_format))
+            for size in self.sizes
+            for image_format in self.formats
+        )
+
+    async def ensure(self, source_path: str, content_hash: str, on_request: bool = False):
+        """Render an upload's thumbnails unless they already exist."""
+        if not self.missing(content_hash):
+            return
+        await self.pool.run(
+            render_thumbnails, source_path, content_hash, self.sizes, self.formats,
+            settings.receipt_thumbnail_quality
+        )
+        self.generated += 1
+        if on_request:
+            self.generated_on_request += 1
+
+    async def ensure_quietly(self, source_path: str, content_hash: Optional[str]):
+        """Best-effort thumbnails after OCR; a failure here must not fail the receipt."""
+        if not content_hash:
+            return
+        try:
+            await self.ensure(source_path, content_hash)
+        except Exception as e:
+            print(f"Thumbnail generation failed for {source_path}: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "generated": self.generated,
+            "generated_on_request": self.generated_on_request,
+            "served": self.served,
+            "not_modified": self.not_modified,
+        }
+
+thumbnail_service = ThumbnailService()
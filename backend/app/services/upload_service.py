@@ -0,0 +1,48 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from typing import NamedTuple
+from fastapi import UploadFile
+from app.core.config import settings
+from app.services.storage import BlobStorage, get_storage
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured maximum size."""
+
+class StoredUpload(NamedTuple):
+    path: str  # Blob path; shared by every upload of the same bytes
+    size: int
+    content_hash: str  # SHA-256 hex digest
+
+async def save_upload(file: UploadFile, storage: BlobStorage = None) -> StoredUpload:
+    """Copy an upload to storage in fixed-size chunks, hashing and size-checking as it goes.
+
+    Starlette has already spooled the request body by the time this runs; the request
+    as a whole is bounded by RequestSizeLimitMiddleware, and this check holds each file
+    of a batch to MAX_FILE_SIZE. Data goes to a staging file that is stored under its
+    content hash only once complete, so readers never see a partial file and uploads
+    with the same name can't overwrite each other.
+    """
+    storage = storage or get_storage()
+    
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=storage.staging_directory(), prefix="upload-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while chunk := await file.read(settings.upload_chunk_size):
+                size += len(chunk)
+                if size > settings.max_file_size:
+                    raise UploadTooLarge(f"Upload exceeds {settings.max_file_size} bytes")
+                digest.update(chunk)
+                await asyncio.to_thread(buffer.write, chunk)
+        
+        content_hash = digest.hexdigest()
+        file_path = await asyncio.to_thread(storage.put, temp_path, content_hash)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    
+    return StoredUpload(path=file_path, size=size, content_hash=content_hash)
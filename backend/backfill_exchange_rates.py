@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Script to backfill the local exchange-rate history.
+Run this to load daily rates for dates older than the API's automatic backfill.
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+from datetime import date
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import engine, Base
+from app.models.exchange_rate import ExchangeRate
+from app.services.currency_provider import close_currency_provider
+from app.services.rate_history_service import RateHistoryService
+
+async def backfill_exchange_rates(start: date, end: date):
+    """Download and store daily rates between two dates."""
+    Base.metadata.create_all(bind=engine, tables=[ExchangeRate.__table__])
+    
+    try:
+        service = RateHistoryService()
+        stored = await service.backfill(start, end)
+        print(f"Stored {stored} {service.base_currency} rates from {start} to {end}")
+    except Exception as e:
+        print(f"Error backfilling exchange rates: {e}")
+    finally:
+        await close_currency_provider()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill daily exchange rates")
+    parser.add_argument("--start", type=date.fromisoformat, required=True, help="First day, YYYY-MM-DD")
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today(), help="Last day, YYYY-MM-DD")
+    args = parser.parse_args()
+    asyncio.run(backfill_exchange_rates(args.start, args.end))
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Benchmark upstream rate fetches under a burst of concurrent expense creates.
+
+Simulates the currency step of POST /api/expenses/ for 500 concurrent
+requests against a cold cache, using the offline stub provider with
+simulated network latency, and reports how many upstream fetches ran.
+
+    python benchmarks/bench_currency_singleflight.py --concurrency 500 --latency-ms 50
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.currency_provider import StubRateProvider
+from app.services.currency_service import CurrencyService, rate_cache
+
+async def run_burst(concurrency: int, latency_ms: int, from_currencies: list, to_currency: str):
+    """Fire `concurrency` rate lookups at once and count upstream requests."""
+    rate_cache.clear()
+    provider = StubRateProvider(latency_seconds=latency_ms / 1000)
+
+    async def create_expense(i: int):
+        service = CurrencyService(provider=provider)
+        return await service.get_exchange_rate(from_currencies[i % len(from_currencies)], to_currency)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(create_expense(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "concurrent_creates": concurrency,
+        "distinct_from_currencies": len(set(from_currencies) - {to_currency}),
+        "upstream_calls": provider.requests,
+        "elapsed_ms": round(elapsed * 1000, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--latency-ms", type=int, default=50)
+    args = parser.parse_args()
+
+    scenarios = [
+        ("same currency", ["EUR"]),
+        ("mixed currencies", ["EUR", "GBP", "INR", "CAD", "AUD", "JPY"]),
+    ]
+    for label, from_currencies in scenarios:
+        result = asyncio.run(run_burst(args.concurrency, args.latency_ms, from_currencies, "USD"))
+        print(f"{label}: {result}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+OCR throughput and extraction accuracy over the synthetic receipt corpus.
+
+Runs OCRService with its worker pool, the same path uploads take, over
+synthetic receipt photos of every size and noise level, and prints one
+JSON document with receipts/second, p50/p95 latency, peak RSS and
+per-field accuracy overall and per variant. Save a run and pass it as
+--baseline to a later run to see the differences and fail when accuracy
+drops. Needs a Tesseract binary, or tesserocr and its language data.
+
+    python benchmarks/bench_ocr.py --count 5 --output results.json
+    python benchmarks/bench_ocr.py --count 5 --baseline results.json
+    python benchmarks/bench_ocr.py --corpus /tmp/receipts --sizes small --noise clean grainy
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.services.image_preprocessing import ImagePreprocessor
+from app.services.ocr_engine import OCR_BACKENDS, TesseractRecognizer
+from app.services.ocr_service import OCRService, OCRWorkerPool
+from synthetic_receipts import CORPUS_VERSION, NOISE_LEVELS, SIZES
+
+FIELDS = ["amount", "date", "merchant", "category"]
+
+def field_matches(extracted: dict, truth: dict) -> dict:
+    """Which fields came out matching the rendered receipt."""
+    extracted_date = extracted["date"].date().isoformat() if extracted["date"] else None
+    return {
+        "amount": extracted["amount"] == truth["amount"],
+        "date": extracted_date == truth["date"],
+        "merchant": extracted["merchant"].strip().lower() == truth["merchant"].lower(),
+        "category": extracted["category"] == truth["category"],
+    }
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+def latency_summary(latencies: list) -> dict:
+    return {
+        "p50": round(percentile(latencies, 0.50), 1),
+        "p95": round(percentile(latencies, 0.95), 1),
+        "max": round(max(latencies), 1),
+    }
+
+def accuracy(results: list) -> dict:
+    return {field: round(sum(r["fields"][field] for r in results) / len(results), 3) for field in FIELDS}
+
+def peak_rss_mb(pid: str = "self") -> float:
+    """High-water resident memory of a process, from /proc on Linux."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+async def run_corpus(service: OCRService, receipts: list, concurrency: int) -> list:
+    """OCR every receipt with `concurrency` in flight, recording latency and field matches."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(path: str, truth: dict) -> dict:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                extracted = await service.extract_receipt_data(path, raise_errors=True)
+                error = None
+            except Exception as e:
+                extracted = {"amount": "", "date": None, "merchant": "", "category": ""}
+                error = str(e)
+            return {
+                "variant": truth["variant"],
+                "latency_ms": (time.perf_counter() - started) * 1000,
+                "fields": field_matches(extracted, truth),
+                "error": error,
+            }
+
+    return await asyncio.gather(*(one(path, truth) for path, truth in receipts))
+
+async def benchmark(args, receipts: list) -> dict:
+    pool = OCRWorkerPool(workers=args.workers, max_queue=max(len(receipts), settings.ocr_max_queue))
+    recognizer = TesseractRecognizer(backend=args.backend, tesseract_cmd=args.tesseract_cmd)
+    service = OCRService(pool=pool, preprocessor=ImagePreprocessor(), recognizer=recognizer)
+    concurrency = args.concurrency or pool.workers
+
+    try:
+        # Start every worker and load Tesseract before the clock starts
+        await run_corpus(service, receipts[:pool.workers], pool.workers)
+
+        started = time.perf_counter()
+        results = await run_corpus(service, receipts, concurrency)
+        elapsed = time.perf_counter() - started
+
+        # Workers replaced after OCR_WORKER_MAX_TASKS jobs are gone by now, so this is the live ones only
+        worker_rss = max(peak_rss_mb(str(pid)) for pid in pool.worker_pids())
+    finally:
+        await pool.shutdown()
+
+    variants = {}
+    for result in results:
+        variants.setdefault(result["variant"], []).append(result)
+
+    return {
+        "corpus_version": CORPUS_VERSION,
+        "seed": args.seed,
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "backend": recognizer.backend,
+        "preprocess_steps": service.preprocessor.steps,
+        "workers": pool.workers,
+        "concurrency": concurrency,
+        "receipts": len(results),
+        "errors": sum(result["error"] is not None for result in results),
+        "elapsed_s": round(elapsed, 2),
+        "receipts_per_second": round(len(results) / elapsed, 2),
+        "latency_ms": latency_summary([result["latency_ms"] for result in results]),
+        "peak_rss_mb": {"server": peak_rss_mb(), "worker": worker_rss},
+        "accuracy": accuracy(results),
+        "variants": {
+            variant: {
+                "receipts": len(variant_results),
+                "latency_ms": latency_summary([result["latency_ms"] for result in variant_results]),
+                "accuracy": accuracy(variant_results),
+            }
+            for variant, variant_results in sorted(variants.items())
+        },
+    }
+
+def compare(report: dict, baseline: dict, max_accuracy_drop: float) -> bool:
+    """Print what changed since the baseline run; False when a field's accuracy dropped too far."""
+    if baseline.get("corpus_version") != report["corpus_version"]:
+        print(f"baseline used corpus version {baseline.get('corpus_version')}, this run {report['corpus_version']}", file=sys.stderr)
+    if set(baseline.get("variants", {})) != set(report["variants"]):
+        print("baseline covered different sizes or noise levels; overall numbers are not like for like", file=sys.stderr)
+
+    print(
+        f"receipts/s {baseline['receipts_per_second']} -> {report['receipts_per_second']}, "
+        f"p95 {baseline['latency_ms']['p95']} -> {report['latency_ms']['p95']} ms",
+        file=sys.stderr
+    )
+    ok = True
+    for field in FIELDS:
+        before, after = baseline["accuracy"][field], report["accuracy"][field]
+        regressed = before - after > max_accuracy_drop
+        ok = ok and not regressed
+        print(f"{field}: {before:.3f} -> {after:.3f}{'  REGRESSED' if regressed else ''}", file=sys.stderr)
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=5, help="Receipts per size and noise level")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES))
+    parser.add_argument("--noise", nargs="+", choices=list(NOISE_LEVELS))
+    parser.add_argument("--corpus", help="Keep the generated corpus in this directory and reuse it on later runs")
+    parser.add_argument("--workers", type=int, default=settings.ocr_pool_size)
+    parser.add_argument("--concurrency", type=int, help="Receipts in flight; defaults to the worker count")
+    parser.add_argument("--backend", choices=OCR_BACKENDS, default=settings.ocr_backend)
+    parser.add_argument("--tesseract-cmd", default=settings.tesseract_path)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        directory = args.corpus or scratch
+        manifest_path = os.path.join(directory, "truth.json")
+        manifest = None
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        if manifest is None or (manifest.get("version"), manifest.get("seed"), manifest.get("count")) != (CORPUS_VERSION, args.seed, args.count):
+            # Rendering 12-megapixel photos in a separate process keeps it out of the server's peak RSS
+            subprocess.run([
+                sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "synthetic_receipts.py"),
+                "--count", str(args.count), "--seed", str(args.seed), "--output", directory
+            ], check=True, stdout=subprocess.DEVNULL)
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+
+        wanted = {f"{size}-{noise}" for size in args.sizes or SIZES for noise in args.noise or NOISE_LEVELS}
+        receipts = [
+            (os.path.join(directory, filename), truth)
+            for filename, truth in sorted(manifest["receipts"].items())
+            if truth["variant"] in wanted
+        ]
+        report = asyncio.run(benchmark(args, receipts))
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.max_accuracy_drop):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
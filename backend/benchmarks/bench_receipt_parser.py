@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark receipt field extraction over a corpus of OCR texts.
+
+Times ReceiptParser against the previous per-field regex extraction and
+reports how many fields each got right. The corpus is synthetic receipt
+text plus a few hand-written layouts (day-first dates, other currencies,
+labelled merchants).
+
+    python benchmarks/bench_receipt_parser.py --count 2000 --repeat 5
+    python benchmarks/bench_receipt_parser.py --max-items 60   # long itemised receipts
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime
+from typing import Optional
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.receipt_parser import receipt_parser
+from synthetic_receipts import receipt_text
+
+FIELDS = ["amount", "currency", "date", "merchant", "category"]
+
+HANDWRITTEN = [
+    ("Store: Harbor Hotel\nRoom night 120.00\nCity tax 5.00\nSubtotal 125.00\nTotal: EUR 131.25\n14 Mar 2024\n",
+     {"amount": "131.25", "currency": "EUR", "date": "2024-03-14", "merchant": "Harbor Hotel", "category": "Travel"}),
+    ("\nMumbai Taxi Service\n25/12/2024\nFare Rs 450.00\nTotal 450.00 INR\n",
+     {"amount": "450.00", "currency": "INR", "date": "2024-12-25", "merchant": "Mumbai Taxi Service", "category": "Travel"}),
+    ("Office Depot\n2024-06-30\nPaper 12.99\nToner 1,249.00\nTOTAL $1,261.99\n",
+     {"amount": "1261.99", "currency": "USD", "date": "2024-06-30", "merchant": "Office Depot", "category": "Office"}),
+    ("Merchant: Grand Cinema\n07/04/2024\n2 x Ticket 14.00\nAmount: 28.00\n",
+     {"amount": "28.00", "currency": "USD", "date": "2024-07-04", "merchant": "Grand Cinema", "category": "Entertainment"}),
+]
+
+class LegacyExtractor:
+    """Per-field extraction as OCRService did it before ReceiptParser."""
+
+    def _extract_amount(self, text: str) -> str:
+        """Extract amount from OCR text."""
+        # Look for currency patterns
+        amount_patterns = [
+            r'\$(\d+\.?\d*)',  # $123.45
+            r'(\d+\.?\d*)\s*\$',  # 123.45 $
+            r'(\d+\.?\d*)\s*(?:USD|EUR|GBP|INR)',  # 123.45 USD
+            r'Total[:\s]*(\d+\.?\d*)',  # Total: 123.45
+            r'Amount[:\s]*(\d+\.?\d*)',  # Amount: 123.45
+        ]
+        
+        for pattern in amount_patterns:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                return match.group(1)
+        
+        return ""
+    
+    def _extract_currency(self, text: str) -> str:
+        """Extract currency from OCR text."""
+        currency_patterns = [
+            r'\$',  # Dollar sign
+            r'USD',  # USD
+            r'EUR',  # EUR
+            r'GBP',  # GBP
+            r'INR',  # INR
+        ]
+        
+        for pattern in currency_patterns:
+            if re.search(pattern, text, re.IGNORECASE):
+                if pattern == r'\$':
+                    return "USD"
+                return pattern
+        
+        return "USD"  # Default to USD
+    
+    def _extract_date(self, text: str) -> Optional[datetime]:
+        """Extract date from OCR text."""
+        date_patterns = [
+            r'(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})',  # MM/DD/YYYY or DD/MM/YYYY
+            r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})',  # YYYY/MM/DD
+            r'(\d{1,2})\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+(\d{2,4})',  # DD Mon YYYY
+        ]
+        
+        for pattern in date_patterns:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                try:
+                    if len(match.groups()) == 3:
+                        # Try different date formats
+                        for fmt in ['%m/%d/%Y', '%d/%m/%Y', '%Y/%m/%d', '%d %b %Y']:
+                            try:
+                                date_str = '/'.join(match.groups())
+                                return datetime.strptime(date_str, fmt)
+                            except:
+                                continue
+                except:
+                    continue
+        
+        return None
+    
+    def _extract_merchant(self, text: str) -> str:
+        """Extract merchant name from OCR text."""
+        # Look for common merchant indicators
+        merchant_indicators = [
+            r'Merchant[:\s]*([^\n]+)',
+            r'Store[:\s]*([^\n]+)',
+            r'Business[:\s]*([^\n]+)',
+        ]
+        
+        for pattern in merchant_indicators:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                return match.group(1).strip()
+        
+        # If no specific pattern, take first line as merchant
+        lines = text.split('\n')
+        if lines:
+            return lines[0].strip()
+        
+        return ""
+    
+    def _extract_category(self, text: str) -> str:
+        """Extract expense category from OCR text."""
+        # Look for common expense categories
+        category_keywords = {
+            'food': ['restaurant', 'food', 'dining', 'cafe', 'coffee'],
+            'travel': ['hotel', 'flight', 'taxi', 'uber', 'lyft', 'travel'],
+            'office': ['office', 'supplies', 'stationery', 'equipment'],
+            'transport': ['gas', 'fuel', 'parking', 'toll', 'transport'],
+            'entertainment': ['movie', 'theater', 'entertainment', 'sports'],
+            'utilities': ['electricity', 'water', 'internet', 'phone', 'utility']
+        }
+        
+        text_lower = text.lower()
+        for category, keywords in category_keywords.items():
+            for keyword in keywords:
+                if keyword in text_lower:
+                    return category.title()
+        
+        return "Miscellaneous"
+
+    def parse(self, text: str) -> dict:
+        return {
+            "amount": self._extract_amount(text),
+            "currency": self._extract_currency(text),
+            "date": self._extract_date(text),
+            "merchant": self._extract_merchant(text),
+            "category": self._extract_category(text),
+        }
+
+def build_corpus(count: int, seed: int, max_items: int):
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        if i % 10 == 0:
+            corpus.append(HANDWRITTEN[(i // 10) % len(HANDWRITTEN)])
+        else:
+            lines, truth = receipt_text(rng, max_items)
+            corpus.append(("\n".join(lines), truth))
+    return corpus
+
+def score(extracted: dict, truth: dict) -> dict:
+    extracted_date = extracted["date"].date().isoformat() if extracted["date"] else None
+    return {
+        "amount": extracted["amount"].replace(",", "") == truth["amount"],
+        "currency": extracted["currency"] == truth["currency"],
+        "date": extracted_date == truth["date"],
+        "merchant": extracted["merchant"].strip() == truth["merchant"],
+        "category": extracted["category"] == truth["category"],
+    }
+
+def run(label: str, parse, corpus: list, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text, _ in corpus:
+            parse(text)
+        best = min(best, time.perf_counter() - started)
+
+    correct = {field: 0 for field in FIELDS}
+    for text, truth in corpus:
+        for field, ok in score(parse(text), truth).items():
+            correct[field] += ok
+
+    print(f"{label}: {best / len(corpus) * 1e6:.1f} us/receipt")
+    print("  accuracy: " + ", ".join(f"{field} {correct[field]}/{len(corpus)}" for field in FIELDS))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-items", type=int, default=6)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.count, args.seed, args.max_items)
+    run("per-field regexes", LegacyExtractor().parse, corpus, args.repeat)
+    run("ReceiptParser", receipt_parser.parse, corpus, args.repeat)
+
+if __name__ == "__main__":
+    main()
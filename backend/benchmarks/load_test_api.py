@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Concurrent HTTP load test of the expense, approval and user endpoints.
+
+Signs up a throwaway admin on a running API, seeds some expenses, then
+keeps `--concurrency` clients cycling through a mix of reads and expense
+creates for `--duration` seconds. Prints one JSON document with
+requests/second, p50/p95/p99 latency and errors, overall and per
+endpoint. Run it against one uvicorn worker to see how much the event
+loop overlaps database round-trips.
+
+    uvicorn app.main:app --port 8000 --workers 1 &
+    python benchmarks/load_test_api.py --concurrency 50 --duration 20 --output after.json
+    python benchmarks/load_test_api.py --concurrency 50 --duration 20 --baseline before.json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from collections import defaultdict
+import httpx
+
+ENDPOINTS = [
+    ("GET", "/api/expenses/?limit=20"),
+    ("GET", "/api/expenses/categories/"),
+    ("GET", "/api/users/company"),
+    ("GET", "/api/approvals/pending"),
+    ("POST", "/api/expenses/"),
+]
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+def latency_summary(latencies: list) -> dict:
+    if not latencies:
+        return {}
+    return {
+        "p50": round(percentile(latencies, 0.50), 1),
+        "p95": round(percentile(latencies, 0.95), 1),
+        "p99": round(percentile(latencies, 0.99), 1),
+        "max": round(max(latencies), 1),
+    }
+
+def expense_body(i: int) -> dict:
+    return {
+        "amount": f"{10 + i % 90}.50",
+        "currency": "USD",
+        "description": f"Load test expense {i}",
+        "expense_date": "2024-01-15T00:00:00",
+    }
+
+async def sign_in(client: httpx.AsyncClient) -> dict:
+    email = f"loadtest-{uuid.uuid4().hex[:12]}@example.com"
+    password = uuid.uuid4().hex
+    response = await client.post("/api/auth/register", json={
+        "email": email, "password": password, "first_name": "Load", "last_name": "Test", "role": "admin",
+    })
+    response.raise_for_status()
+    response = await client.post("/api/auth/login", data={"username": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def run(base_url: str, concurrency: int, duration: float, seed_expenses: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        headers = await sign_in(client)
+        for i in range(seed_expenses):
+            (await client.post("/api/expenses/", json=expense_body(i), headers=headers)).raise_for_status()
+
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        deadline = time.perf_counter() + duration
+
+        async def user(worker: int):
+            i = worker
+            while time.perf_counter() < deadline:
+                method, path = ENDPOINTS[i % len(ENDPOINTS)]
+                started = time.perf_counter()
+                try:
+                    if method == "POST":
+                        response = await client.post(path, json=expense_body(i), headers=headers)
+                    else:
+                        response = await client.get(path, headers=headers)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                latencies[path].append((time.perf_counter() - started) * 1000)
+                if failed:
+                    errors[path] += 1
+                i += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(worker) for worker in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    every = [latency for values in latencies.values() for latency in values]
+    return {
+        "base_url": base_url,
+        "concurrency": concurrency,
+        "duration_seconds": round(elapsed, 1),
+        "requests": len(every),
+        "errors": sum(errors.values()),
+        "requests_per_second": round(len(every) / elapsed, 1),
+        "latency_ms": latency_summary(every),
+        "endpoints": {
+            path: {
+                "requests": len(values),
+                "errors": errors[path],
+                "latency_ms": latency_summary(values),
+            }
+            for path, values in latencies.items()
+        },
+    }
+
+def compare(report: dict, baseline: dict) -> dict:
+    return {
+        "requests_per_second": [baseline["requests_per_second"], report["requests_per_second"]],
+        "p50_ms": [baseline["latency_ms"].get("p50"), report["latency_ms"].get("p50")],
+        "p95_ms": [baseline["latency_ms"].get("p95"), report["latency_ms"].get("p95")],
+        "p99_ms": [baseline["latency_ms"].get("p99"), report["latency_ms"].get("p99")],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of load")
+    parser.add_argument("--seed-expenses", type=int, default=20)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.base_url, args.concurrency, args.duration, args.seed_expenses))
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["vs_baseline"] = compare(report, json.load(f))
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    return 1 if report["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Script to delete stored receipt files that no receipt references any more.
+Files stored within STORAGE_GC_GRACE_SECONDS are kept, so it is safe to run
+while the API is accepting uploads.
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.services.storage import collect_garbage, get_storage
+
+def gc_receipt_blobs(grace_seconds: int, dry_run: bool):
+    """Remove unreferenced blobs and their thumbnails."""
+    db = SessionLocal()
+    
+    try:
+        result = collect_garbage(db, grace_seconds=grace_seconds, dry_run=dry_run)
+        action = "Would delete" if dry_run else "Deleted"
+        print(
+            f"Scanned {result['scanned']} blobs in {get_storage().name} storage: "
+            f"{result['referenced']} referenced, {result['recent']} within the grace period. "
+            f"{action} {result['deleted']}; removed {result['stale_staged']} abandoned partial uploads"
+        )
+    except Exception as e:
+        print(f"Error collecting receipt blobs: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete receipt files no receipt references")
+    parser.add_argument("--grace-seconds", type=int, default=settings.storage_gc_grace_seconds,
+                        help="Keep unreferenced files stored more recently than this")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted")
+    args = parser.parse_args()
+    gc_receipt_blobs(args.grace_seconds, args.dry_run)